@@ -5,6 +5,8 @@ from rekuest.actors.functional import (
     FunctionalThreadedGenActor,
     FunctionalProcessedFuncActor,
     FunctionalProcessedGenActor,
+    FunctionalBatchedFuncActor,
+    FunctionalPooledProcessedFuncActor,
 )
 
 import inspect
@@ -16,6 +18,7 @@ from rekuest.actors.types import ActorBuilder
 from rekuest.api.schema import PortGroupInput, DefinitionInput, WidgetInput, EffectInput
 from typing import Optional, Any, Dict, Union, Callable, Coroutine, Type, List, Tuple
 from rekuest.actors.base import Passport
+from rekuest.actors.memoize import ResultCache
 from rekuest.actors.transport.types import ActorTransport
 from .errors import ActifierException
 
@@ -62,6 +65,19 @@ def reactify(
     widgets: Dict[str, WidgetInput] = None,
     interfaces: List[str] = [],
     in_process: bool = False,
+    max_concurrency: Optional[int] = None,
+    max_queued: Optional[int] = None,
+    batch: bool = False,
+    batch_size: int = 8,
+    batch_window: float = 0.01,
+    process_pool_size: Optional[int] = None,
+    process_initializer: Optional[Callable[..., None]] = None,
+    process_initargs: Tuple[Any, ...] = (),
+    shared_memory_threshold: Optional[int] = None,
+    executor_size: Optional[int] = None,
+    executor_name: Optional[str] = None,
+    cache: Union[bool, ResultCache, None] = None,
+    progress_flush_interval: Optional[float] = 0.1,
     **params,
 ) -> Tuple[DefinitionInput, ActorBuilder]:
     """Reactify a function
@@ -69,6 +85,33 @@ def reactify(
     This function takes a callable (of type async or sync function or generator) and
     returns a builder function that creates an actor that makes the function callable
     from the rekuest server.
+
+    Set max_concurrency to limit how many assignments of the actor run at the same
+    time, further assignments wait (up to max_queued) for a free slot, and are
+    denied once the queue is full.
+
+    Set batch to gather up to batch_size assignments that arrive within batch_window
+    seconds, and call the function once with lists of inputs (see BatchedFuncActor).
+
+    Set process_pool_size (together with in_process) to run the function in a pool of
+    warm worker processes, that are started (and initialized with process_initializer)
+    once when the actor is provided (see PooledProcessedFuncActor).
+
+    Set shared_memory_threshold (in bytes) to pass larger buffers (bytes, memoryviews
+    and NumPy arrays) to and from in_process actors through shared memory instead of
+    pickling them.
+
+    Set executor_size to change the number of threads of threaded actors, and
+    executor_name to run them in a named thread pool that is shared with all other
+    actors using that name (see ThreadPoolRegistry).
+
+    Set cache (True or a ResultCache) to memoize the returns of a deterministic
+    function, repeated assignments with the same args are then answered without
+    calling the function.
+
+    Progress updates and log lines of an assignment are coalesced for
+    progress_flush_interval seconds (see CoalescingAssignTransport), set it to None
+    to send every update right away.
     """
 
     definition = prepare_definition(
@@ -91,6 +134,14 @@ def reactify(
     is_generatorfunction = inspect.isgeneratorfunction(function)
     is_function = inspect.isfunction(function)
 
+    if cache is True:
+        cache = ResultCache()
+    elif cache is False:
+        cache = None
+
+    if cache is not None and (is_asyncgen or is_generatorfunction):
+        raise ActifierException("Only functions can be memoized, not generators")
+
     actor_attributes = {
         "assign": function,
         "expand_inputs": not bypass_expand,
@@ -99,27 +150,69 @@ def reactify(
         "on_unprovide": on_unprovide if on_unprovide else async_none_unprovide,
         "structure_registry": structure_registry,
         "definition": definition,
+        "max_concurrency": max_concurrency,
+        "max_queued": max_queued,
+        "result_cache": cache,
+        "progress_flush_interval": progress_flush_interval,
     }
 
-    if is_coroutine:
+    threaded_attributes = {"executor_name": executor_name}
+    if executor_size is not None:
+        threaded_attributes["executor_size"] = executor_size
+
+    if batch:
+        if not (is_coroutine or is_function or is_method) or in_process:
+            raise ActifierException(
+                "Batching is only supported for (async) functions that run in this process"
+            )
+        return definition, higher_order_builder(
+            FunctionalBatchedFuncActor,
+            batch_size=batch_size,
+            batch_window=batch_window,
+            **actor_attributes,
+        )
+    elif process_pool_size is not None:
+        if (
+            not in_process
+            or not (is_function or is_method)
+            or is_coroutine
+            or is_asyncgen
+            or is_generatorfunction
+        ):
+            raise ActifierException(
+                "Process pools are only supported for sync functions with in_process=True"
+            )
+        return definition, higher_order_builder(
+            FunctionalPooledProcessedFuncActor,
+            pool_size=process_pool_size,
+            pool_initializer=process_initializer,
+            pool_initargs=process_initargs,
+            shared_memory_threshold=shared_memory_threshold,
+            **actor_attributes,
+        )
+    elif is_coroutine:
         return definition, higher_order_builder(FunctionalFuncActor, **actor_attributes)
     elif is_asyncgen:
         return definition, higher_order_builder(FunctionalGenActor, **actor_attributes)
     elif is_generatorfunction and not in_process:
         return definition, higher_order_builder(
-            FunctionalThreadedGenActor, **actor_attributes
+            FunctionalThreadedGenActor, **threaded_attributes, **actor_attributes
         )
     elif (is_function or is_method) and not in_process:
         return definition, higher_order_builder(
-            FunctionalThreadedFuncActor, **actor_attributes
+            FunctionalThreadedFuncActor, **threaded_attributes, **actor_attributes
         )
     elif is_generatorfunction and in_process:
         return definition, higher_order_builder(
-            FunctionalProcessedGenActor, **actor_attributes
+            FunctionalProcessedGenActor,
+            shared_memory_threshold=shared_memory_threshold,
+            **actor_attributes,
         )
     elif (is_function or is_method) and in_process:
         return definition, higher_order_builder(
-            FunctionalProcessedFuncActor, **actor_attributes
+            FunctionalProcessedFuncActor,
+            shared_memory_threshold=shared_memory_threshold,
+            **actor_attributes,
         )
     else:
         raise ActifierException("No way of converting this to a function")
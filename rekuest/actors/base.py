@@ -1,9 +1,11 @@
-from typing import Dict, Union, Callable, Awaitable, List
+from typing import Dict, Union, Callable, Awaitable, List, Tuple
 
 from pydantic import BaseModel, Field, PrivateAttr
 from rekuest.structures.registry import (
     StructureRegistry,
 )
+from rekuest.structures.errors import StructureRegistryError
+from rekuest.structures.hooks import enum as enum_hook, standard as standard_hook
 import asyncio
 import logging
 from rekuest.api.schema import (
@@ -13,6 +15,8 @@ from rekuest.api.schema import (
     ProvisionStatus,
     ProvisionMode,
     LogLevelInput,
+    NodeKind,
+    Scope,
 )
 from rekuest.messages import Assignation, Provision, Unassignation
 from rekuest.actors.errors import UnknownMessageError, ProvisionDelegateException
@@ -26,12 +30,29 @@ from rekuest.definition.registry import (
 )
 from rekuest.actors.types import Assignment, Passport, Unassignment
 import uuid
+from collections import OrderedDict
+from functools import partial
 from rekuest.collection.collector import Collector
 from rekuest.api.schema import TemplateFragment
 from rekuest.actors.transport.local_transport import ProxyActorTransport
+from rekuest.actors.memoize import ResultCache, MemoizingAssignTransport
+from rekuest.actors.transport.coalescing import CoalescingAssignTransport
+from rekuest.definition.validate import hash_definition
+from rekuest.structures.parse_collectables import parse_collectable
+from rekuest.structures.serialization.compiled import (
+    CompiledDefinition,
+    compile_definition,
+)
 
 logger = logging.getLogger(__name__)
 
+NOOP_COLLECTORS = (None, standard_hook.void_acollect, enum_hook.void_acollect)
+""" Collectors that don't delete anything (e.g. of global structures)"""
+
+
+UNASSIGNMENT_PRIORITY = float("inf")
+""" Unassignments are always processed before any queued assignment"""
+
 
 @runtime_checkable
 class Agent(Protocol):
@@ -49,8 +70,20 @@ class Actor(BaseModel):
     supervisor: Optional["Actor"] = None
     managed_actors: Dict[str, "Actor"] = Field(default_factory=dict)
     running_assignments: Dict[str, Assignment] = Field(default_factory=dict)
-
-    _in_queue: Contextual[asyncio.Queue] = PrivateAttr(default=None)
+    max_concurrency: Optional[int] = None
+    """ The maximum number of assignments that run at the same time (None is unbounded)"""
+    max_queued: Optional[int] = None
+    """ The maximum number of assignments waiting for a free slot (None is unbounded)"""
+    progress_flush_interval: Optional[float] = 0.1
+    """ Seconds progress updates and logs are coalesced for (None sends them right away)"""
+
+    _in_queue: Contextual[asyncio.PriorityQueue] = PrivateAttr(default=None)
+    _in_sequence: int = PrivateAttr(default=0)
+    _inbox_assignments: Dict[str, bool] = PrivateAttr(default_factory=dict)
+    _active_assignments: int = PrivateAttr(default=0)
+    _waiting_assignments: "OrderedDict[str, Tuple[Assignment, AssignTransport]]" = (
+        PrivateAttr(default_factory=OrderedDict)
+    )
     _running_asyncio_tasks: Dict[str, asyncio.Task] = PrivateAttr(default_factory=dict)
     _running_transports: Dict[str, AssignTransport] = PrivateAttr(default_factory=dict)
     _provision_task: asyncio.Task = PrivateAttr(default=None)
@@ -73,11 +106,22 @@ class Actor(BaseModel):
         )
 
     async def apass(self, message: Union[Unassignment, Assignment]):
-        assert self._in_queue, "Actor is currently not listening"
-        await self._in_queue.put(message)
+        assert self._in_queue is not None, "Actor is currently not listening"
+        if isinstance(message, Unassignment):
+            priority = UNASSIGNMENT_PRIORITY
+            if message.id in self._inbox_assignments:
+                # The assignment is still waiting in the inbox (behind us)
+                self._inbox_assignments[message.id] = True
+        else:
+            priority = getattr(message, "priority", 0)
+            self._inbox_assignments[message.id] = False
+
+        # The sequence number keeps messages of the same priority in order
+        self._in_sequence += 1
+        await self._in_queue.put((-priority, self._in_sequence, message))
 
     async def arun(self):
-        self._in_queue = asyncio.Queue()
+        self._in_queue = asyncio.PriorityQueue()
         self._provision_task = asyncio.create_task(self.alisten())
         return self._provision_task
 
@@ -149,6 +193,8 @@ class Actor(BaseModel):
 
     def assign_task_done(self, task):
         logger.info(f"Assign task is done: {task}")
+        if task.cancelled():
+            return
         if task.exception():
             try:
                 raise task.exception()
@@ -160,27 +206,122 @@ class Actor(BaseModel):
                 )
             pass
 
+    async def arun_assignment(
+        self,
+        assignment: Assignment,
+        collector: AssignationCollector,
+        transport: AssignTransport,
+    ):
+        """Runs an assignment (the task of every assignment runs this)"""
+        return await self.on_assign(
+            assignment,
+            collector=collector,
+            transport=transport,
+        )
+
+    def _start_assignment(self, assignment: Assignment, transport: AssignTransport):
+        task = asyncio.create_task(
+            self.arun_assignment(
+                assignment,
+                collector=self.collector,
+                transport=transport,
+            )
+        )
+
+        task.add_done_callback(self.assign_task_done)
+        task.add_done_callback(partial(self._reap_assignment, assignment.id))
+
+        if self.max_concurrency is not None:
+            self._active_assignments += 1
+            task.add_done_callback(self._assign_slot_done)
+
+        self._running_transports[assignment.id] = transport
+        self._running_asyncio_tasks[assignment.id] = task
+
+    def _reap_assignment(self, id: str, task: asyncio.Task):
+        # Only reap if the entry was not replaced in the meantime
+        if self._running_asyncio_tasks.get(id) is task:
+            del self._running_asyncio_tasks[id]
+            self._running_transports.pop(id, None)
+
+    def tracked_entries(self) -> Dict[str, int]:
+        """The number of entries this actor is currently keeping track of
+
+        Finished assignments are reaped, so these numbers should stay proportional
+        to the current load of the actor. Useful for monitoring long running
+        provisions.
+        """
+        return {
+            "inbox": self._in_queue.qsize() if self._in_queue is not None else 0,
+            "running_tasks": len(self._running_asyncio_tasks),
+            "running_transports": len(self._running_transports),
+            "waiting_assignments": len(self._waiting_assignments),
+            "managed_actors": len(self.managed_actors),
+        }
+
+    def _assign_slot_done(self, task):
+        self._active_assignments -= 1
+        if self._waiting_assignments and self._in_queue is not None:
+            # max returns the first (oldest) of equally prioritized assignments
+            id = max(
+                self._waiting_assignments,
+                key=lambda id: self._waiting_assignments[id][0].priority,
+            )
+            assignment, transport = self._waiting_assignments.pop(id)
+            self._start_assignment(assignment, transport)
+
     async def aprocess(self, message: Union[Assignment, Unassignment]):
         logger.info(f"Actor for {self.passport}: Received {message}")
 
         if isinstance(message, Assignment):
             transport = self.transport.spawn(message)
-
-            task = asyncio.create_task(
-                self.on_assign(
-                    message,
-                    collector=self.collector,
-                    transport=transport,
+            if self.progress_flush_interval is not None:
+                transport = CoalescingAssignTransport(
+                    transport, flush_interval=self.progress_flush_interval
                 )
-            )
 
-            task.add_done_callback(self.assign_task_done)
+            if (
+                self.max_concurrency is None
+                or self._active_assignments < self.max_concurrency
+            ):
+                self._start_assignment(message, transport)
 
-            self._running_transports[message.id] = transport
-            self._running_asyncio_tasks[message.id] = task
+            elif (
+                self.max_queued is None
+                or len(self._waiting_assignments) < self.max_queued
+            ):
+                # There is no queued status on the server, so we are reporting
+                # the backpressure as received (but not yet assigned)
+                self._waiting_assignments[message.id] = (message, transport)
+                await transport.change(
+                    status=AssignationStatus.RECEIVED,
+                    message=(
+                        f"Queued: {len(self._waiting_assignments)} assignments are"
+                        f" waiting for one of {self.max_concurrency} slots"
+                    ),
+                )
+
+            else:
+                logger.warning(
+                    f"Actor for {self.passport}: Denying {message.id}, queue is full"
+                )
+                await transport.change(
+                    status=AssignationStatus.DENIED,
+                    message=(
+                        f"Actor is at capacity ({self.max_concurrency} running,"
+                        f" {len(self._waiting_assignments)} queued)"
+                    ),
+                )
 
         elif isinstance(message, Unassignment):
-            if message.id in self._running_asyncio_tasks:
+            if message.id in self._waiting_assignments:
+                _, assign_transport = self._waiting_assignments.pop(message.id)
+                await assign_transport.change(
+                    status=AssignationStatus.CANCELLED,
+                    message="Cancelled through arkitekt",
+                )
+
+            elif message.id in self._running_asyncio_tasks:
                 task = self._running_asyncio_tasks[message.id]
                 assign_transport = self._running_transports[message.id]
 
@@ -196,14 +337,19 @@ class Actor(BaseModel):
                             status=AssignationStatus.CANCELLED,
                             message="Cancelled through arkitekt",
                         )
-                        del self._running_asyncio_tasks[message.id]
-                        del self._running_transports[message.id]
+                        self._running_asyncio_tasks.pop(message.id, None)
+                        self._running_transports.pop(message.id, None)
 
                 else:
                     logger.warning(
                         f"Race Condition: Task was already done before cancellation"
                     )
 
+            elif message.id in self._inbox_assignments:
+                logger.info(
+                    f"Actor for {self.passport}: {message.id} will be cancelled before it starts"
+                )
+
             else:
                 logger.warning(
                     f"Actor for {self.passport}: Received unassignment for unknown assignation {message.id}"
@@ -217,7 +363,16 @@ class Actor(BaseModel):
             logger.info(f"Actor for {self.passport}: Is now active")
 
             while True:
-                message = await self._in_queue.get()
+                _, _, message = await self._in_queue.get()
+                if isinstance(message, Assignment) and self._inbox_assignments.pop(
+                    message.id, False
+                ):
+                    await self.transport.spawn(message).change(
+                        status=AssignationStatus.CANCELLED,
+                        message="Cancelled through arkitekt",
+                    )
+                    continue
+
                 try:
                     await self.aprocess(message)
                 except Exception as e:
@@ -228,11 +383,23 @@ class Actor(BaseModel):
         except asyncio.CancelledError:
             logger.info("Doing Whatever needs to be done to cancel!")
 
-            [i.cancel() for i in self._running_asyncio_tasks.values()]
+            waiting = list(self._waiting_assignments.values())
+            self._waiting_assignments.clear()
+            for assignment, assign_transport in waiting:
+                await assign_transport.change(
+                    status=AssignationStatus.CRITICAL,
+                    message="Cancelled by Application",
+                )
 
-            for task, assign_transport in zip(
-                self._running_asyncio_tasks.values(), self._running_transports.values()
-            ):
+            # Tasks reap themselves when they finish, so we need a snapshot
+            running = [
+                (task, self._running_transports[id])
+                for id, task in self._running_asyncio_tasks.items()
+            ]
+
+            [task.cancel() for task, _ in running]
+
+            for task, assign_transport in running:
                 try:
                     await task
                 except asyncio.CancelledError:
@@ -316,6 +483,83 @@ class SerializingActor(Actor):
     structure_registry: StructureRegistry
     expand_inputs: bool = True
     shrink_outputs: bool = True
+    result_cache: Optional[ResultCache] = None
+    """ Memoizes the returns of a pure function node (see ResultCache)"""
+
+    _compiled: CompiledDefinition = PrivateAttr(default=None)
+    _definition_hash: Optional[str] = PrivateAttr(default=None)
+
+    def __init__(self, **data):
+        super().__init__(**data)
+        # Compiling once at build time, so that assignments don't need to
+        # revalidate the definition and redo the port dispatch
+        self._compiled = compile_definition(self.definition, self.structure_registry)
+        if self.result_cache is not None:
+            self._definition_hash = hash_definition(self.definition)
+
+    def _is_memoizable(self, returns: Any) -> bool:
+        # Returned structures that are collected (deleted) later can't be reused,
+        # global structures (and structures without a collector) outlive the
+        # assignation
+        for identifier, _ in parse_collectable(self.definition, tuple(returns)):
+            try:
+                collector = self.structure_registry.get_collector_for_identifier(
+                    identifier
+                )
+            except StructureRegistryError:
+                continue
+
+            if collector in NOOP_COLLECTORS:
+                continue
+            if (
+                self.structure_registry.identifier_scope_map.get(identifier)
+                == Scope.GLOBAL
+            ):
+                continue
+            return False
+        return True
+
+    async def arun_assignment(
+        self,
+        assignment: Assignment,
+        collector: AssignationCollector,
+        transport: AssignTransport,
+    ):
+        if self.result_cache is None or self.definition.kind != NodeKind.FUNCTION:
+            return await super().arun_assignment(assignment, collector, transport)
+
+        key = self.result_cache.key_for(self._definition_hash, assignment.args)
+        if key is None:
+            return await super().arun_assignment(assignment, collector, transport)
+
+        hit, returns = await self.result_cache.aget(key)
+        if hit:
+            logger.debug(f"Returning memoized result for {assignment.id}")
+            await transport.change(
+                status=AssignationStatus.RETURNED,
+                returns=returns,
+            )
+            return
+
+        async def on_returned(returns):
+            if self._is_memoizable(returns):
+                await self.result_cache.aput(key, returns)
+
+        return await super().arun_assignment(
+            assignment,
+            collector,
+            MemoizingAssignTransport(transport, on_returned),
+        )
+
+    async def aexpand_inputs(self, args: List[Any]) -> Dict[str, Any]:
+        return await self._compiled.aexpand_inputs(
+            args, skip_expanding=not self.expand_inputs
+        )
+
+    async def ashrink_outputs(self, returns: Any) -> Tuple[Any]:
+        return await self._compiled.ashrink_outputs(
+            returns, skip_shrinking=not self.shrink_outputs
+        )
 
 
 Actor.update_forward_refs()
@@ -0,0 +1,82 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+from pydantic import BaseModel, Field, PrivateAttr
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+GLOBAL_THREAD_POOL_REGISTRY = None
+
+
+def get_default_thread_pool_registry() -> "ThreadPoolRegistry":
+    global GLOBAL_THREAD_POOL_REGISTRY
+    if GLOBAL_THREAD_POOL_REGISTRY is None:
+        GLOBAL_THREAD_POOL_REGISTRY = ThreadPoolRegistry()
+    return GLOBAL_THREAD_POOL_REGISTRY
+
+
+class ThreadPoolRegistry(BaseModel):
+    """ThreadPoolRegistry
+
+    Keeps named thread pools that can be shared by threaded actors (e.g. one
+    pool for all actors of an agent, or a dedicated pool for a library that
+    releases the GIL). Pools are created on first use and shut down once the
+    last actor using them releases them.
+    """
+
+    default_size: int = 4
+    sizes: Dict[str, int] = Field(default_factory=dict)
+
+    _pools: Dict[str, ThreadPoolExecutor] = PrivateAttr(default_factory=dict)
+    _users: Dict[str, int] = PrivateAttr(default_factory=dict)
+
+    def configure(self, name: str, max_workers: int):
+        """Sets the size of a named pool (before it is first used)"""
+        if name in self._pools:
+            logger.warning(f"Thread pool {name} is already running, size unchanged")
+        self.sizes[name] = max_workers
+
+    def acquire(
+        self, name: str, max_workers: Optional[int] = None
+    ) -> ThreadPoolExecutor:
+        """Returns the named pool, creating it if needed
+
+        Args:
+            name (str): The name of the pool
+            max_workers (int, optional): The size if the pool is created and not configured.
+        """
+        if name not in self._pools:
+            size = self.sizes.get(name, max_workers or self.default_size)
+            self._pools[name] = ThreadPoolExecutor(
+                max_workers=size, thread_name_prefix=f"rekuest-{name}"
+            )
+            self._users[name] = 0
+
+        self._users[name] += 1
+        return self._pools[name]
+
+    def release(self, name: str):
+        """Releases the named pool, shutting it down if it is no longer used"""
+        if name not in self._pools:
+            return
+
+        self._users[name] -= 1
+        if self._users[name] <= 0:
+            pool = self._pools.pop(name)
+            del self._users[name]
+            pool.shutdown(wait=False)
+
+    def shutdown(self):
+        """Shuts down all pools"""
+        for pool in self._pools.values():
+            pool.shutdown(wait=False)
+        self._pools = {}
+        self._users = {}
+
+    def running_pools(self) -> Dict[str, int]:
+        """The number of actors using each running pool"""
+        return dict(self._users)
+
+    class Config:
+        underscore_attrs_are_private = True
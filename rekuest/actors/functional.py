@@ -1,19 +1,30 @@
 import asyncio
+import inspect
 import logging
-from concurrent.futures import ThreadPoolExecutor
-from typing import Any, Awaitable, Callable
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
 from koil.helpers import iterate_spawned, run_spawned, iterate_processed, run_processed
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 from rekuest.actors.base import SerializingActor
 from rekuest.messages import Assignation, Provision
-from rekuest.api.schema import AssignationStatus, ProvisionFragment
-from rekuest.structures.serialization.actor import expand_inputs, shrink_outputs
+from rekuest.api.schema import AssignationStatus, ProvisionFragment, ProvisionStatus
 from rekuest.actors.contexts import AssignationContext
 from rekuest.actors.types import OnProvide, OnUnprovide, Assignment, Unassignment
 from rekuest.collection.collector import Collector
 from rekuest.actors.transport.types import AssignTransport
 from rekuest.structures.parse_collectables import parse_collectable
 from rekuest.structures.errors import SerializationError
+from rekuest.actors.executors import (
+    ThreadPoolRegistry,
+    get_default_thread_pool_registry,
+)
+from rekuest.actors.shared_memory import (
+    SharedMemoryScope,
+    call_with_shared_memory,
+    iterate_with_shared_memory,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -45,12 +56,7 @@ class AsyncFuncActor(SerializingActor):
         transport: AssignTransport,
     ):
         try:
-            params = await expand_inputs(
-                self.definition,
-                assignment.args,
-                structure_registry=self.structure_registry,
-                skip_expanding=not self.expand_inputs,
-            )
+            params = await self.aexpand_inputs(assignment.args)
 
             await transport.change(
                 status=AssignationStatus.ASSIGNED,
@@ -61,12 +67,7 @@ class AsyncFuncActor(SerializingActor):
             ):
                 returns = await self.assign(**params)
 
-            returns = await shrink_outputs(
-                self.definition,
-                returns,
-                structure_registry=self.structure_registry,
-                skip_shrinking=not self.shrink_outputs,
-            )
+            returns = await self.ashrink_outputs(returns)
 
             collector.register(assignment, parse_collectable(self.definition, returns))
 
@@ -103,12 +104,7 @@ class AsyncGenActor(SerializingActor):
         transport: AssignTransport,
     ):
         try:
-            params = await expand_inputs(
-                self.definition,
-                assignment.args,
-                structure_registry=self.structure_registry,
-                skip_expanding=not self.expand_inputs,
-            )
+            params = await self.aexpand_inputs(assignment.args)
 
             await transport.change(
                 status=AssignationStatus.ASSIGNED,
@@ -118,12 +114,7 @@ class AsyncGenActor(SerializingActor):
                 assignment=assignment, transport=transport, passport=self.passport
             ):
                 async for returns in self.assign(**params):
-                    returns = await shrink_outputs(
-                        self.definition,
-                        returns,
-                        structure_registry=self.structure_registry,
-                        skip_shrinking=not self.shrink_outputs,
-                    )
+                    returns = await self.ashrink_outputs(returns)
 
                     collector.register(
                         assignment, parse_collectable(self.definition, returns)
@@ -158,6 +149,146 @@ class AsyncGenActor(SerializingActor):
             raise ex
 
 
+class BatchedFuncActor(SerializingActor):
+    """An actor that calls its function once for a batch of assignments
+
+    Assignments that arrive within batch_window seconds of each other (up to
+    batch_size assignments) are gathered, and the function is called once with
+    a list of values for every argument. The function needs to return a list
+    with one return value per assignment, in the same order. Sync functions are
+    run in a thread.
+
+    As one call serves multiple assignments, assignation helpers (e.g. progress
+    and log) are not available within the batched function.
+    """
+
+    batch_size: int = 8
+    batch_window: float = 0.01
+
+    _batch: List[Tuple[Dict[str, Any], asyncio.Future]] = PrivateAttr(
+        default_factory=list
+    )
+    _batch_timer: Optional[asyncio.TimerHandle] = PrivateAttr(default=None)
+    _batch_tasks: Set[asyncio.Task] = PrivateAttr(default_factory=set)
+
+    def _schedule_batch(self, params: Dict[str, Any]) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self._batch.append((params, future))
+
+        if len(self._batch) >= self.batch_size:
+            self._flush_batch()
+        elif self._batch_timer is None:
+            self._batch_timer = asyncio.get_running_loop().call_later(
+                self.batch_window, self._flush_batch
+            )
+
+        return future
+
+    def _flush_batch(self):
+        if self._batch_timer is not None:
+            self._batch_timer.cancel()
+            self._batch_timer = None
+
+        # Assignments that were cancelled while waiting are dropped
+        batch = [
+            (params, future) for params, future in self._batch if not future.done()
+        ]
+        self._batch = []
+        if batch:
+            # The loop only keeps weak references to tasks
+            task = asyncio.create_task(self._arun_batch(batch))
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+
+    async def _arun_batch(self, batch: List[Tuple[Dict[str, Any], asyncio.Future]]):
+        # Params can have different keys (e.g. expanding drops None args)
+        keys = dict.fromkeys(key for params, _ in batch for key in params)
+        kwargs = {key: [params.get(key) for params, _ in batch] for key in keys}
+
+        try:
+            if inspect.iscoroutinefunction(self.assign):
+                results = await self.assign(**kwargs)
+            else:
+                results = await run_spawned(self.assign, **kwargs)
+
+            results = list(results)
+            assert len(results) == len(batch), (
+                f"Batched function returned {len(results)} results for a batch of"
+                f" {len(batch)} assignments"
+            )
+
+        except asyncio.CancelledError:
+            for _, future in batch:
+                future.cancel()
+            raise
+
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def unprovide(self):
+        if self._batch_timer is not None:
+            self._batch_timer.cancel()
+            self._batch_timer = None
+        for _, future in self._batch:
+            future.cancel()
+        self._batch = []
+
+        for task in list(self._batch_tasks):
+            task.cancel()
+        await asyncio.gather(*self._batch_tasks, return_exceptions=True)
+        await super().unprovide()
+
+    async def on_assign(
+        self,
+        assignment: Assignment,
+        collector: Collector,
+        transport: AssignTransport,
+    ):
+        try:
+            params = await self.aexpand_inputs(assignment.args)
+
+            await transport.change(
+                status=AssignationStatus.ASSIGNED,
+            )
+
+            returns = await self._schedule_batch(params)
+
+            returns = await self.ashrink_outputs(returns)
+
+            collector.register(assignment, parse_collectable(self.definition, returns))
+
+            await transport.change(
+                status=AssignationStatus.RETURNED,
+                returns=returns,
+            )
+
+        except SerializationError as ex:
+            await transport.change(
+                status=AssignationStatus.CRITICAL,
+                message=str(ex),
+            )
+
+        except AssertionError as ex:
+            await transport.change(
+                status=AssignationStatus.CRITICAL,
+                message=str(ex),
+            )
+
+        except Exception as e:
+            logger.error("Assignation error", exc_info=True)
+            await transport.change(
+                status=AssignationStatus.ERROR,
+                message=repr(e),
+            )
+
+
 class FunctionalFuncActor(FunctionalActor, AsyncFuncActor):
     async def progress(self, value, percentage):
         await self._progress(value, percentage)
@@ -174,8 +305,53 @@ class FunctionalGenActor(FunctionalActor, AsyncGenActor):
         arbitrary_types_allowed = True
 
 
-class ThreadedFuncActor(SerializingActor):
-    executor: ThreadPoolExecutor = Field(default_factory=lambda: ThreadPoolExecutor(1))
+class ThreadedActor(SerializingActor):
+    """Base for actors that run their function in a thread pool
+
+    By default every actor owns a pool of executor_size threads. Set executor_name
+    to use a named pool of the thread pool registry instead, which is shared by
+    all actors using that name. An explicitly passed executor is used as is and
+    never shut down by the actor. Owned pools are shut down (and shared pools
+    released) on unprovide.
+    """
+
+    executor: Optional[ThreadPoolExecutor] = None
+    executor_size: int = 1
+    executor_name: Optional[str] = None
+    thread_pool_registry: ThreadPoolRegistry = Field(
+        default_factory=get_default_thread_pool_registry
+    )
+
+    _owned_executor: Optional[ThreadPoolExecutor] = PrivateAttr(default=None)
+    _acquired_executor: Optional[ThreadPoolExecutor] = PrivateAttr(default=None)
+
+    def get_executor(self) -> ThreadPoolExecutor:
+        if self.executor is not None:
+            return self.executor
+
+        if self.executor_name is not None:
+            if self._acquired_executor is None:
+                self._acquired_executor = self.thread_pool_registry.acquire(
+                    self.executor_name, max_workers=self.executor_size
+                )
+            return self._acquired_executor
+
+        if self._owned_executor is None:
+            self._owned_executor = ThreadPoolExecutor(self.executor_size)
+        return self._owned_executor
+
+    async def unprovide(self):
+        await super().unprovide()
+        if self._owned_executor is not None:
+            self._owned_executor.shutdown(wait=False)
+            self._owned_executor = None
+        if self._acquired_executor is not None:
+            self.thread_pool_registry.release(self.executor_name)
+            self._acquired_executor = None
+
+
+class ThreadedFuncActor(ThreadedActor):
+    executor_size: int = 1
 
     async def on_assign(
         self,
@@ -185,12 +361,7 @@ class ThreadedFuncActor(SerializingActor):
     ):
         try:
             logger.info("Assigning Number two")
-            params = await expand_inputs(
-                self.definition,
-                assignment.args,
-                structure_registry=self.structure_registry,
-                skip_expanding=not self.expand_inputs,
-            )
+            params = await self.aexpand_inputs(assignment.args)
 
             await transport.change(
                 status=AssignationStatus.ASSIGNED,
@@ -200,15 +371,13 @@ class ThreadedFuncActor(SerializingActor):
                 assignment=assignment, transport=transport, passport=self.passport
             ):
                 returns = await run_spawned(
-                    self.assign, **params, executor=self.executor, pass_context=True
+                    self.assign,
+                    **params,
+                    executor=self.get_executor(),
+                    pass_context=True,
                 )
 
-            returns = await shrink_outputs(
-                self.definition,
-                returns,
-                structure_registry=self.structure_registry,
-                skip_shrinking=not self.shrink_outputs,
-            )
+            returns = await self.ashrink_outputs(returns)
 
             collector.register(assignment, parse_collectable(self.definition, returns))
 
@@ -239,8 +408,8 @@ class ThreadedFuncActor(SerializingActor):
             )
 
 
-class ThreadedGenActor(SerializingActor):
-    executor: ThreadPoolExecutor = Field(default_factory=lambda: ThreadPoolExecutor(4))
+class ThreadedGenActor(ThreadedActor):
+    executor_size: int = 4
 
     async def on_assign(
         self,
@@ -249,12 +418,7 @@ class ThreadedGenActor(SerializingActor):
         transport: AssignTransport,
     ):
         try:
-            params = await expand_inputs(
-                self.definition,
-                assignment.args,
-                structure_registry=self.structure_registry,
-                skip_expanding=not self.expand_inputs,
-            )
+            params = await self.aexpand_inputs(assignment.args)
             await transport.change(
                 status=AssignationStatus.ASSIGNED,
             )
@@ -263,14 +427,12 @@ class ThreadedGenActor(SerializingActor):
                 assignment=assignment, transport=transport, passport=self.passport
             ):
                 async for returns in iterate_spawned(
-                    self.assign, **params, executor=self.executor, pass_context=True
+                    self.assign,
+                    **params,
+                    executor=self.get_executor(),
+                    pass_context=True,
                 ):
-                    returns = await shrink_outputs(
-                        self.definition,
-                        returns,
-                        structure_registry=self.structure_registry,
-                        skip_shrinking=not self.shrink_outputs,
-                    )
+                    returns = await self.ashrink_outputs(returns)
 
                     collector.register(
                         assignment, parse_collectable(self.definition, returns)
@@ -306,6 +468,9 @@ class ThreadedGenActor(SerializingActor):
 
 
 class ProcessedGenActor(SerializingActor):
+    shared_memory_threshold: Optional[int] = None
+    """ Pass buffers larger than this (in bytes) through shared memory (None disables)"""
+
     async def on_assign(
         self,
         assignment: Assignation,
@@ -313,12 +478,7 @@ class ProcessedGenActor(SerializingActor):
         transport: AssignTransport,
     ):
         try:
-            params = await expand_inputs(
-                self.definition,
-                assignment.args,
-                structure_registry=self.structure_registry,
-                skip_expanding=not self.expand_inputs,
-            )
+            params = await self.aexpand_inputs(assignment.args)
             await transport.change(
                 status=AssignationStatus.ASSIGNED,
             )
@@ -326,22 +486,28 @@ class ProcessedGenActor(SerializingActor):
             async with AssignationContext(
                 assignment=assignment, transport=transport, passport=self.passport
             ):
-                async for returns in iterate_processed(self.assign, **params):
-                    returns = await shrink_outputs(
-                        self.definition,
-                        returns,
-                        structure_registry=self.structure_registry,
-                        skip_shrinking=not self.shrink_outputs,
-                    )
-
-                    collector.register(
-                        assignment, parse_collectable(self.definition, returns)
-                    )
-
-                    await self.transport.change(
-                        status=AssignationStatus.YIELD,
-                        returns=returns,
-                    )
+                with SharedMemoryScope(self.shared_memory_threshold) as scope:
+                    if self.shared_memory_threshold is None:
+                        iterator = iterate_processed(self.assign, **params)
+                    else:
+                        iterator = iterate_processed(
+                            iterate_with_shared_memory,
+                            self.assign,
+                            self.shared_memory_threshold,
+                            scope.share_kwargs(params),
+                        )
+
+                    async for returns in iterator:
+                        returns = await self.ashrink_outputs(scope.collect(returns))
+
+                        collector.register(
+                            assignment, parse_collectable(self.definition, returns)
+                        )
+
+                        await transport.change(
+                            status=AssignationStatus.YIELD,
+                            returns=returns,
+                        )
 
             await transport.change(status=AssignationStatus.DONE)
 
@@ -368,6 +534,9 @@ class ProcessedGenActor(SerializingActor):
 
 
 class ProcessedFuncActor(SerializingActor):
+    shared_memory_threshold: Optional[int] = None
+    """ Pass buffers larger than this (in bytes) through shared memory (None disables)"""
+
     async def on_assign(
         self,
         assignment: Assignment,
@@ -376,12 +545,7 @@ class ProcessedFuncActor(SerializingActor):
     ):
         try:
             logger.info("Assigning Number two")
-            params = await expand_inputs(
-                self.definition,
-                assignment.args,
-                structure_registry=self.structure_registry,
-                skip_expanding=not self.expand_inputs,
-            )
+            params = await self.aexpand_inputs(assignment.args)
 
             await transport.change(
                 status=AssignationStatus.ASSIGNED,
@@ -390,18 +554,149 @@ class ProcessedFuncActor(SerializingActor):
             async with AssignationContext(
                 assignment=assignment, transport=transport, passport=self.passport
             ):
-                returns = await run_processed(
-                    self.assign,
-                    **params,
-                )
+                with SharedMemoryScope(self.shared_memory_threshold) as scope:
+                    if self.shared_memory_threshold is None:
+                        returns = await run_processed(
+                            self.assign,
+                            **params,
+                        )
+                    else:
+                        returns = scope.collect(
+                            await run_processed(
+                                call_with_shared_memory,
+                                self.assign,
+                                self.shared_memory_threshold,
+                                scope.share_kwargs(params),
+                            )
+                        )
+
+            returns = await self.ashrink_outputs(returns)
+
+            collector.register(assignment, parse_collectable(self.definition, returns))
 
-            returns = await shrink_outputs(
-                self.definition,
-                returns,
-                structure_registry=self.structure_registry,
-                skip_shrinking=not self.shrink_outputs,
+            await transport.change(
+                status=AssignationStatus.RETURNED,
+                returns=returns,
             )
 
+        except SerializationError as ex:
+            await transport.change(
+                status=AssignationStatus.CRITICAL,
+                message=str(ex),
+            )
+
+        except AssertionError as ex:
+            await transport.change(
+                status=AssignationStatus.CRITICAL,
+                message=str(ex),
+            )
+
+        except Exception as e:
+            logger.error("Error in actor", exc_info=True)
+            await transport.change(
+                status=AssignationStatus.CRITICAL,
+                message=str(e),
+            )
+
+
+def _warm_worker():
+    """Does nothing, but forces the pool to start (and initialize) a worker"""
+    return None
+
+
+class PooledProcessedFuncActor(SerializingActor):
+    """An actor that runs its function in a pool of long lived processes
+
+    Other than the ProcessedFuncActor (which starts a process per call), the
+    workers of the pool are started once when the actor is provided, and run
+    pool_initializer (e.g. to load a model into a module global) before they
+    receive their first assignment. The pool is shut down on unprovide.
+
+    The function (and the initializer) need to be picklable, i.e. defined at
+    the top level of a module.
+    """
+
+    pool_size: int = 1
+    pool_initializer: Optional[Callable[..., None]] = None
+    pool_initargs: Tuple[Any, ...] = ()
+    pool_context: str = "spawn"
+    shared_memory_threshold: Optional[int] = None
+    """ Pass buffers larger than this (in bytes) through shared memory (None disables)"""
+
+    _pool: Optional[ProcessPoolExecutor] = PrivateAttr(default=None)
+
+    async def provide(self):
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.pool_size,
+            mp_context=multiprocessing.get_context(self.pool_context),
+            initializer=self.pool_initializer,
+            initargs=self.pool_initargs,
+        )
+
+        try:
+            # Workers are started lazily, submitting one call per worker warms them all
+            loop = asyncio.get_running_loop()
+            await asyncio.gather(
+                *[
+                    loop.run_in_executor(self._pool, _warm_worker)
+                    for _ in range(self.pool_size)
+                ]
+            )
+        except Exception as e:
+            logger.critical(f"Warming Error {self.passport} {e}", exc_info=True)
+            # Not leaking the workers that did start (unprovide might not be called)
+            self._pool.shutdown(wait=False)
+            self._pool = None
+            await self.aset_status(
+                status=ProvisionStatus.CRITICAL,
+                message=f"Could not start process pool: {e}",
+            )
+            return
+
+        await super().provide()
+
+    async def unprovide(self):
+        await super().unprovide()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+
+    async def on_assign(
+        self,
+        assignment: Assignment,
+        collector: Collector,
+        transport: AssignTransport,
+    ):
+        try:
+            params = await self.aexpand_inputs(assignment.args)
+
+            await transport.change(
+                status=AssignationStatus.ASSIGNED,
+            )
+
+            assert self._pool is not None, "Process pool is not running"
+
+            loop = asyncio.get_running_loop()
+            with SharedMemoryScope(self.shared_memory_threshold) as scope:
+                if self.shared_memory_threshold is None:
+                    returns = await loop.run_in_executor(
+                        self._pool, partial(self.assign, **params)
+                    )
+                else:
+                    returns = scope.collect(
+                        await loop.run_in_executor(
+                            self._pool,
+                            partial(
+                                call_with_shared_memory,
+                                self.assign,
+                                self.shared_memory_threshold,
+                                scope.share_kwargs(params),
+                            ),
+                        )
+                    )
+
+            returns = await self.ashrink_outputs(returns)
+
             collector.register(assignment, parse_collectable(self.definition, returns))
 
             await transport.change(
@@ -459,3 +754,19 @@ class FunctionalProcessedGenActor(FunctionalActor, ProcessedGenActor):
 
     class Config:
         arbitrary_types_allowed = True
+
+
+class FunctionalBatchedFuncActor(FunctionalActor, BatchedFuncActor):
+    async def progress(self, value, percentage):
+        await self._progress(value, percentage)
+
+    class Config:
+        arbitrary_types_allowed = True
+
+
+class FunctionalPooledProcessedFuncActor(FunctionalActor, PooledProcessedFuncActor):
+    async def progress(self, value, percentage):
+        await self._progress(value, percentage)
+
+    class Config:
+        arbitrary_types_allowed = True
@@ -0,0 +1,171 @@
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+import asyncio
+import hashlib
+import json
+import logging
+import shelve
+import threading
+import time
+from rekuest.api.schema import AssignationStatus
+
+logger = logging.getLogger(__name__)
+
+
+class ResultCache:
+    """A size and TTL bounded cache of the (shrunk) returns of pure nodes
+
+    Maps the serialized args of an assignment to the serialized returns, so
+    an actor can answer a repeated assignment without calling its function.
+    Only use this for deterministic functions without side effects.
+
+    If a path is given, results are also written to a shelve database at that
+    path, so they survive restarts. The on-disk store is only bounded by the
+    TTL, maxsize applies to the in memory store.
+
+    Args:
+        maxsize (int, optional): The maximum number of results kept in memory. Defaults to 1024.
+        ttl (float, optional): Seconds a result stays valid. Defaults to None (no expiry).
+        path (str, optional): A path for an on-disk store. Defaults to None.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttl: Optional[float] = None,
+        path: Optional[str] = None,
+    ) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._store: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._shelf: Optional[shelve.Shelf] = None
+        self._shelf_lock = threading.Lock()
+
+    @staticmethod
+    def key_for(namespace: str, args: List[Any]) -> Optional[str]:
+        """The cache key for the serialized args (None if they are not serializable)"""
+        try:
+            serialized = json.dumps(args, sort_keys=True, separators=(",", ":"))
+        except (TypeError, ValueError):
+            return None
+        return hashlib.sha256(f"{namespace}:{serialized}".encode()).hexdigest()
+
+    def _get_shelf(self) -> Optional[shelve.Shelf]:
+        if self.path is not None and self._shelf is None:
+            self._shelf = shelve.open(self.path)
+        return self._shelf
+
+    def _is_valid(self, expires: float) -> bool:
+        return self.ttl is None or time.time() < expires
+
+    def _get_remembered(self, key: str) -> Optional[Tuple[float, Any]]:
+        entry = self._store.get(key)
+        if entry is not None:
+            if self._is_valid(entry[0]):
+                self._store.move_to_end(key)
+                return entry
+            del self._store[key]
+        return None
+
+    def _get_stored(self, key: str) -> Optional[Tuple[float, Any]]:
+        with self._shelf_lock:
+            shelf = self._get_shelf()
+            entry = shelf.get(key) if shelf is not None else None
+            if entry is not None and not self._is_valid(entry[0]):
+                del shelf[key]
+                entry = None
+        return entry
+
+    def _put_stored(self, key: str, entry: Tuple[float, Any]) -> None:
+        with self._shelf_lock:
+            shelf = self._get_shelf()
+            if shelf is not None:
+                shelf[key] = entry
+                shelf.sync()
+
+    def _found(self, key: str, entry: Optional[Tuple[float, Any]]) -> Tuple[bool, Any]:
+        if entry is None:
+            self.misses += 1
+            return False, None
+
+        self._remember(key, entry)
+        self.hits += 1
+        return True, entry[1]
+
+    def _entry_for(self, returns: Any) -> Tuple[float, Any]:
+        return (time.time() + self.ttl if self.ttl is not None else 0, returns)
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """Returns (True, returns) on a hit and (False, None) on a miss"""
+        entry = self._get_remembered(key)
+        if entry is None:
+            entry = self._get_stored(key)
+        return self._found(key, entry)
+
+    async def aget(self, key: str) -> Tuple[bool, Any]:
+        """Same as get, but reads the on-disk store in a thread"""
+        entry = self._get_remembered(key)
+        if entry is None and self.path is not None:
+            loop = asyncio.get_running_loop()
+            entry = await loop.run_in_executor(None, self._get_stored, key)
+        return self._found(key, entry)
+
+    def _remember(self, key: str, entry: Tuple[float, Any]) -> None:
+        self._store[key] = entry
+        self._store.move_to_end(key)
+        while len(self._store) > self.maxsize:
+            self._store.popitem(last=False)
+
+    def put(self, key: str, returns: Any) -> None:
+        entry = self._entry_for(returns)
+        self._remember(key, entry)
+        self._put_stored(key, entry)
+
+    async def aput(self, key: str, returns: Any) -> None:
+        """Same as put, but writes the on-disk store in a thread"""
+        entry = self._entry_for(returns)
+        self._remember(key, entry)
+        if self.path is not None:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self._put_stored, key, entry)
+
+    def clear(self) -> None:
+        self._store.clear()
+        with self._shelf_lock:
+            shelf = self._get_shelf()
+            if shelf is not None:
+                shelf.clear()
+
+    def close(self) -> None:
+        with self._shelf_lock:
+            if self._shelf is not None:
+                self._shelf.close()
+                self._shelf = None
+
+    def __len__(self) -> int:
+        return len(self._store)
+
+
+class MemoizingAssignTransport:
+    """Forwards to an assign transport, and reports the returns of the assignment"""
+
+    def __init__(
+        self, transport: Any, on_returned: Callable[[Any], Awaitable[None]]
+    ) -> None:
+        self.transport = transport
+        self.assignment = transport.assignment
+        self.on_returned = on_returned
+
+    async def change(self, status=None, message=None, returns=None, progress=None):
+        await self.transport.change(
+            status=status, message=message, returns=returns, progress=progress
+        )
+
+        if status == AssignationStatus.RETURNED and returns is not None:
+            await self.on_returned(returns)
+
+    async def log(self, level=None, message=None):
+        await self.transport.log(level=level, message=message)
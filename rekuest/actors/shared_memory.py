@@ -0,0 +1,239 @@
+"""Passing large buffers to (and from) processed actors through shared memory
+
+Processed actors pickle their arguments to the worker process and their
+returns back. For large buffers (bytes, memoryviews and NumPy arrays) this
+means copying the data through a pipe. Here, these buffers are placed in
+`multiprocessing.shared_memory` segments instead, and only a small handle is
+pickled. The worker maps the segment without copying (NumPy arrays and
+memoryviews are views onto the segment, bytes are copied out once).
+
+Argument segments are owned by a SharedMemoryScope, which lives as long as
+the assignment and unlinks them when it exits. Segments the worker created
+for its returns are unlinked as soon as the returns are read back.
+"""
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_SHARED_MEMORY_THRESHOLD = 1024 * 1024
+""" Buffers smaller than this (in bytes) are pickled as usual"""
+
+
+class SharedBuffer:
+    """A picklable handle to a buffer in a shared memory segment"""
+
+    def __init__(
+        self,
+        name: str,
+        nbytes: int,
+        kind: str,
+        dtype: Optional[str] = None,
+        shape: Optional[Tuple[int, ...]] = None,
+    ) -> None:
+        self.name = name
+        self.nbytes = nbytes
+        self.kind = kind
+        self.dtype = dtype
+        self.shape = shape
+
+
+def _is_ndarray(value: Any) -> bool:
+    # Checking the module avoids importing numpy (an optional dependency)
+    return type(value).__module__ == "numpy" and type(value).__name__ == "ndarray"
+
+
+def _share(
+    value: Any, threshold: int
+) -> Tuple[Any, Optional[shared_memory.SharedMemory]]:
+    """Places a large buffer in a new shared memory segment
+
+    Returns the handle and the segment, or the untouched value and None if the
+    value is not a (large enough) buffer.
+    """
+    if isinstance(value, (bytes, bytearray)):
+        kind, dtype, shape, nbytes = "bytes", None, None, len(value)
+        source = memoryview(value)
+    elif isinstance(value, memoryview):
+        kind, dtype, shape, nbytes = "memoryview", None, None, value.nbytes
+        source = value.cast("B") if value.contiguous else memoryview(value.tobytes())
+    elif _is_ndarray(value) and not value.dtype.hasobject:
+        kind, dtype, shape, nbytes = (
+            "ndarray",
+            value.dtype.str,
+            value.shape,
+            value.nbytes,
+        )
+        source = None
+    else:
+        return value, None
+
+    if nbytes < threshold or nbytes == 0:
+        return value, None
+
+    segment = shared_memory.SharedMemory(create=True, size=nbytes)
+    if source is not None:
+        segment.buf[:nbytes] = source
+    else:
+        import numpy as np
+
+        np.ndarray(value.shape, dtype=value.dtype, buffer=segment.buf)[...] = value
+
+    return SharedBuffer(segment.name, nbytes, kind, dtype=dtype, shape=shape), segment
+
+
+def _attach(handle: SharedBuffer, copy: bool) -> Tuple[Any, shared_memory.SharedMemory]:
+    """Maps a shared buffer, returning a view (or a copy) and the segment"""
+    segment = shared_memory.SharedMemory(name=handle.name)
+    view = segment.buf[: handle.nbytes]
+
+    if handle.kind == "bytes":
+        value = bytes(view)
+        view.release()
+    elif handle.kind == "memoryview":
+        value = memoryview(bytes(view)) if copy else view.toreadonly()
+        if copy:
+            view.release()
+    else:
+        import numpy as np
+
+        value = np.ndarray(handle.shape, dtype=np.dtype(handle.dtype), buffer=view)
+        if copy:
+            value = value.copy()
+            view.release()
+
+    return value, segment
+
+
+def _close(segment: shared_memory.SharedMemory) -> None:
+    try:
+        segment.close()
+    except BufferError:
+        # A view onto the segment is still alive (e.g. kept by the function),
+        # the mapping is released once the view is garbage collected
+        logger.debug(f"Shared memory segment {segment.name} is still in use")
+
+
+def _unlink(segment: shared_memory.SharedMemory) -> None:
+    _close(segment)
+    try:
+        segment.unlink()
+    except FileNotFoundError:
+        pass
+
+
+def _share_returns(
+    returns: Any, threshold: int
+) -> Tuple[Any, List[shared_memory.SharedMemory]]:
+    segments = []
+
+    def share(value):
+        value, segment = _share(value, threshold)
+        if segment is not None:
+            segments.append(segment)
+        return value
+
+    if isinstance(returns, tuple):
+        return tuple(share(value) for value in returns), segments
+    return share(returns), segments
+
+
+def _attach_kwargs(kwargs: Dict[str, Any]) -> Tuple[Dict[str, Any], List[Any]]:
+    segments = []
+    attached = {}
+    for key, value in kwargs.items():
+        if isinstance(value, SharedBuffer):
+            value, segment = _attach(value, copy=False)
+            segments.append(segment)
+        attached[key] = value
+    return attached, segments
+
+
+def call_with_shared_memory(
+    function: Callable[..., Any], threshold: int, kwargs: Dict[str, Any]
+) -> Any:
+    """Calls the function in the worker, mapping shared arguments and sharing returns
+
+    Returned segments are only closed (not unlinked) in the worker, the parent
+    unlinks them once it has read the returns.
+    """
+    attached, segments = _attach_kwargs(kwargs)
+    try:
+        returns = function(**attached)
+    finally:
+        del attached
+        for segment in segments:
+            _close(segment)
+
+    returns, returned_segments = _share_returns(returns, threshold)
+    for segment in returned_segments:
+        segment.close()
+    return returns
+
+
+def iterate_with_shared_memory(
+    function: Callable[..., Iterator[Any]], threshold: int, kwargs: Dict[str, Any]
+) -> Iterator[Any]:
+    """Iterates the generator in the worker (see call_with_shared_memory)"""
+    attached, segments = _attach_kwargs(kwargs)
+    try:
+        for returns in function(**attached):
+            returns, returned_segments = _share_returns(returns, threshold)
+            for segment in returned_segments:
+                segment.close()
+            yield returns
+    finally:
+        del attached
+        for segment in segments:
+            _close(segment)
+
+
+class SharedMemoryScope:
+    """Owns the shared memory segments of one assignment
+
+    Use share_kwargs to place the arguments in shared memory, and collect to
+    read back the returns of the worker. All segments are unlinked when the
+    scope exits.
+    """
+
+    def __init__(
+        self, threshold: Optional[int] = DEFAULT_SHARED_MEMORY_THRESHOLD
+    ) -> None:
+        self.threshold = threshold
+        self._segments: List[shared_memory.SharedMemory] = []
+
+    def share_kwargs(self, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """Places the large buffers of the kwargs in shared memory"""
+        shared = {}
+        for key, value in kwargs.items():
+            value, segment = _share(value, self.threshold)
+            if segment is not None:
+                self._segments.append(segment)
+            shared[key] = value
+        return shared
+
+    def _collect_value(self, value: Any) -> Any:
+        if not isinstance(value, SharedBuffer):
+            return value
+
+        # Returns outlive the assignment, so they are copied out of the segment
+        # (and the segment can be unlinked right away, e.g. for every yield)
+        value, segment = _attach(value, copy=True)
+        _unlink(segment)
+        return value
+
+    def collect(self, returns: Any) -> Any:
+        """Reads back the (shared) returns of the worker"""
+        if isinstance(returns, tuple):
+            return tuple(self._collect_value(value) for value in returns)
+        return self._collect_value(returns)
+
+    def __enter__(self) -> "SharedMemoryScope":
+        return self
+
+    def __exit__(self, *args) -> None:
+        for segment in self._segments:
+            _unlink(segment)
+        self._segments = []
@@ -0,0 +1,95 @@
+import asyncio
+import logging
+from typing import Any, List, Optional, Tuple
+
+from rekuest.api.schema import AssignationStatus, LogLevelInput
+from rekuest.actors.transport.types import AssignTransport
+
+logger = logging.getLogger(__name__)
+
+
+class CoalescingAssignTransport:
+    """Coalesces the progress updates and log lines of an assignment
+
+    Progress updates and log lines are held back for at most flush_interval
+    seconds. Of the progress updates in one interval, only the latest one is
+    sent, and consecutive log lines of the same level are joined into one log
+    message. Every other status change (e.g. RETURNED, DONE, ERROR or CRITICAL)
+    first flushes what is pending and is then sent right away, so the order of
+    messages is kept and terminal statuses are never delayed.
+
+    Args:
+        transport (AssignTransport): The transport to forward to
+        flush_interval (float, optional): Seconds to hold back updates. Defaults to 0.1.
+        max_log_lines (int, optional): The maximum number of lines joined into one log message. Defaults to 50.
+    """
+
+    def __init__(
+        self,
+        transport: AssignTransport,
+        flush_interval: float = 0.1,
+        max_log_lines: int = 50,
+    ) -> None:
+        self.transport = transport
+        self.assignment = transport.assignment
+        self.flush_interval = flush_interval
+        self.max_log_lines = max_log_lines
+        self._progress: Optional[Tuple[int, Optional[str]]] = None
+        self._logs: List[Tuple[Any, str]] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    def _schedule_flush(self) -> None:
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._aflush_later())
+
+    async def _aflush_later(self) -> None:
+        await asyncio.sleep(self.flush_interval)
+        try:
+            await self.aflush()
+        except Exception:
+            logger.error(
+                f"Could not flush updates of {self.assignment.assignation}",
+                exc_info=True,
+            )
+
+    async def aflush(self) -> None:
+        """Sends the pending log lines and the latest progress"""
+        async with self._lock:
+            logs, self._logs = self._logs, []
+            progress, self._progress = self._progress, None
+
+            while logs:
+                level = logs[0][0]
+                lines = []
+                while logs and logs[0][0] == level and len(lines) < self.max_log_lines:
+                    lines.append(logs.pop(0)[1])
+                await self.transport.log(level=level, message="\n".join(lines))
+
+            if progress is not None:
+                await self.transport.change(
+                    status=AssignationStatus.PROGRESS,
+                    progress=progress[0],
+                    message=progress[1],
+                )
+
+    async def change(
+        self,
+        status: AssignationStatus = None,
+        message: str = None,
+        returns: List[Any] = None,
+        progress: int = None,
+    ):
+        if status == AssignationStatus.PROGRESS and returns is None:
+            self._progress = (progress, message)
+            self._schedule_flush()
+            return
+
+        await self.aflush()
+        await self.transport.change(
+            status=status, message=message, returns=returns, progress=progress
+        )
+
+    async def log(self, level: LogLevelInput = None, message: str = None):
+        self._logs.append((level, message if message is not None else ""))
+        self._schedule_flush()
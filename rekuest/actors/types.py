@@ -1,6 +1,6 @@
 from typing import Protocol, runtime_checkable, Callable, Awaitable, Any
 from rekuest.structures.registry import StructureRegistry
-from rekuest.messages import Provision
+from rekuest.messages import Provision, summarize_args
 from rekuest.rath import RekuestRath
 from rekuest.api.schema import TemplateFragment, PortGroupInput, AssignationStatus
 from rekuest.definition.define import DefinitionInput
@@ -23,6 +23,11 @@ class Assignment(BaseModel):
     args: List[Any] = Field(default_factory=list)
     user: Optional[str]
     reference: Optional[str]
+    priority: int = 0
+    """ Assignments with a higher priority are processed first by the actor"""
+
+    def __repr_args__(self):
+        return summarize_args(super().__repr_args__())
 
 
 class AssignmentUpdate(BaseModel):
@@ -1,6 +1,6 @@
 from typing import Callable, Dict, List, Optional, Tuple, Union
 
-from pydantic import Field
+from pydantic import Field, PrivateAttr
 from rekuest.actors.base import Actor
 from rekuest.actors.types import ActorBuilder, Passport
 from rekuest.agents.errors import ProvisionException
@@ -16,7 +16,8 @@ from rekuest.definition.registry import (
 )
 from rekuest.definition.registry import get_default_definition_registry
 from rekuest.rath import RekuestRath
-from rekuest.definition.validate import auto_validate
+from rekuest.definition.validate import auto_validate, hash_definition
+from rekuest.definition.define import DefinitionInput
 import asyncio
 from rekuest.agents.transport.base import AgentTransport
 from rekuest.messages import Assignation, Unassignation, Unprovision, Provision, Inquiry
@@ -36,6 +37,7 @@ from .transport.errors import DefiniteConnectionFail, CorrectableConnectionFail
 from rekuest.api.schema import aget_template
 from rekuest.agents.extension import AgentExtension
 from rekuest.agents.hooks import HooksRegistry, get_default_hook_registry
+from rekuest.agents.templates import TemplateCache
 from typing import Any
 
 
@@ -78,15 +80,72 @@ class BaseAgent(KoiledModel):
     provision_passport_map: Dict[str, Passport] = Field(default_factory=dict)
     managed_assignments: Dict[str, Assignment] = Field(default_factory=dict)
     hook_registry: HooksRegistry = Field(default_factory=get_default_hook_registry)
+    template_cache: TemplateCache = Field(default_factory=TemplateCache)
+    registration_concurrency: int = 8
+    """ The maximum number of templates that are created at the same time"""
 
     running: bool = False
+    concurrent_provisioning: bool = True
+    """ Process provisions and unprovisions in background tasks (see process)"""
+
     _context: Dict[str, Any] = None
+    _provision_tasks: Dict[str, asyncio.Task] = PrivateAttr(default_factory=dict)
 
     def register_extension(self, name: str, extension: AgentExtension):
         self.extensions[name] = extension
 
     async def process(
         self, message: Union[Assignation, Provision, Unassignation, Unprovision]
+    ):
+        """Dispatches a message from the transport
+
+        Provisions and unprovisions (which can take long, e.g. when loading a
+        model on provide) are processed in background tasks, so they don't stall
+        the messages of other provisions. Messages for the same provision are
+        still processed in the order they were received: while a provision task
+        is pending, later messages for that provision are queued behind it.
+        """
+        provision = getattr(message, "provision", None)
+        if not self.concurrent_provisioning or provision is None:
+            return await self.aprocess_message(message)
+
+        if (
+            isinstance(message, (Provision, Unprovision))
+            or provision in self._provision_tasks
+        ):
+            self._schedule_for_provision(provision, message)
+        else:
+            await self.aprocess_message(message)
+
+    def _schedule_for_provision(
+        self,
+        provision: str,
+        message: Union[Assignation, Provision, Unassignation, Unprovision],
+    ):
+        previous = self._provision_tasks.get(provision)
+
+        async def aprocess_after_previous():
+            if previous is not None:
+                await asyncio.wait([previous])
+            try:
+                await self.aprocess_message(message)
+            except Exception:
+                logger.critical(
+                    f"Error processing {message} for provision {provision}",
+                    exc_info=True,
+                )
+
+        task = asyncio.create_task(aprocess_after_previous())
+        self._provision_tasks[provision] = task
+
+        def reap(task):
+            if self._provision_tasks.get(provision) is task:
+                del self._provision_tasks[provision]
+
+        task.add_done_callback(reap)
+
+    async def aprocess_message(
+        self, message: Union[Assignation, Provision, Unassignation, Unprovision]
     ):
         logger.info(f"Agent processes {message}")
 
@@ -96,11 +155,15 @@ class BaseAgent(KoiledModel):
                 actor = self.managed_actors[passport.id]
 
                 # Converting assignation to Assignment
-                message = Assignment(
+                assignment = Assignment(
                     assignation=message.assignation,
-                    args=message.args,
                     user=message.user,
+                    priority=message.priority or 0,
                 )
+                # The args are passed on as they were received (not validated
+                # or copied again), they are expanded by the actor
+                assignment.args = message.args if message.args is not None else []
+                message = assignment
                 self.managed_assignments[message.assignation] = message
                 await actor.apass(message)
             else:
@@ -218,28 +281,54 @@ class BaseAgent(KoiledModel):
                 instance_id=instance_id or self.instance_id,
             )  # Lets register all the extensions
 
-        for (
-            interface,
-            definition,
-        ) in self.definition_registry.definitions.items():
-            # Defined Node are nodes that are not yet reflected on arkitekt (i.e they dont have an instance
-            # id so we are trying to send them to arkitekt)
-            try:
-                arkitekt_template = await acreate_template(
-                    definition=definition,
-                    interface=interface,
-                    instance_id=instance_id or self.instance_id,
-                    rath=self.rath,
-                )
-            except Exception as e:
-                logger.info(
-                    f"Error Creating template for {definition} at interface {interface}"
+        instance_id = instance_id or self.instance_id
+        semaphore = asyncio.Semaphore(self.registration_concurrency)
+
+        async def aregister_definition(interface: str, definition: DefinitionInput):
+            definition_hash = hash_definition(definition)
+            arkitekt_template = self.template_cache.get(
+                instance_id, interface, definition_hash
+            )
+
+            if arkitekt_template is None:
+                # Defined Node are nodes that are not yet reflected on arkitekt (i.e they dont have an instance
+                # id so we are trying to send them to arkitekt)
+                async with semaphore:
+                    try:
+                        arkitekt_template = await acreate_template(
+                            definition=definition,
+                            interface=interface,
+                            instance_id=instance_id,
+                            rath=self.rath,
+                        )
+                    except Exception as e:
+                        logger.info(
+                            f"Error Creating template for {definition} at interface {interface}"
+                        )
+                        raise e
+
+                self.template_cache.put(
+                    instance_id, interface, definition_hash, arkitekt_template
                 )
-                raise e
 
             self.interface_template_map[interface] = arkitekt_template
             self.template_interface_map[arkitekt_template.id] = interface
 
+        # Letting all registrations finish, so the created templates are cached
+        # even if one of them fails
+        results = await asyncio.gather(
+            *[
+                aregister_definition(interface, definition)
+                for interface, definition in self.definition_registry.definitions.items()
+            ],
+            return_exceptions=True,
+        )
+        self.template_cache.save()
+
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+
     async def acheck_status_for_provision(
         self, provision: Provision
     ) -> ProvisionStatus:
@@ -304,10 +393,14 @@ class BaseAgent(KoiledModel):
         """Spawns an Actor from a Provision. This function closely mimics the
         spawining protocol within an actor. But maps template"""
 
-        template = await aget_template(
-            provision.template,
-            rath=self.rath,
-        )
+        # Our own templates are known from registration, no need to ask arkitekt
+        template = self.template_cache.get_by_id(provision.template)
+        if template is None:
+            template = await aget_template(
+                provision.template,
+                rath=self.rath,
+            )
+            self.template_cache.remember(template)
 
         passport = Passport(provision=provision.provision, instance_id=self.instance_id)
 
@@ -347,6 +440,14 @@ class BaseAgent(KoiledModel):
         return self._context
 
     async def astop(self):
+        # Pending provisions are cancelled before the actors
+        pending = list(self._provision_tasks.values())
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.wait(pending)
+        self._provision_tasks = {}
+
         # Cancel all the tasks
         cancelations = [actor.acancel() for actor in self.managed_actors.values()]
         # just stopping the actor, not cancelling the provision..
@@ -0,0 +1,171 @@
+import asyncio
+import logging
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional
+
+from pydantic import BaseModel, Field, PrivateAttr
+
+from rekuest.agents.base import BaseAgent
+from rekuest.agents.hooks import HooksRegistry
+from rekuest.api.schema import LogLevelInput
+
+logger = logging.getLogger(__name__)
+
+
+class ActorSample(BaseModel):
+    provision: str
+    inbox: int
+    running_tasks: int
+    waiting_assignments: int
+
+
+class MonitorSample(BaseModel):
+    timestamp: datetime = Field(default_factory=datetime.utcnow)
+    loop_lag: float
+    """ Seconds the event loop was late to wake up the monitor"""
+    queues: Dict[str, int] = Field(default_factory=dict)
+    """ The queue depths of the transports (e.g. send_queue, in_queue)"""
+    actors: List[ActorSample] = Field(default_factory=list)
+
+    @property
+    def running_tasks(self) -> int:
+        return sum(actor.running_tasks for actor in self.actors)
+
+
+class AgentMonitor(BaseModel):
+    """AgentMonitor
+
+    A background task that samples the event loop lag of the agent, the queue
+    depths of its transport and the inbox sizes and running tasks of its
+    actors. A high loop lag means something blocks the event loop (e.g. a sync
+    function that is not run in a thread), growing queues mean the agent can't
+    keep up with its assignments.
+
+    Samples can be pulled with latest and history. Every report_interval
+    seconds, a summary is logged to the provisions of the actors.
+
+    Register it as a background task (see register_monitor), so it runs while
+    the agent runs.
+    """
+
+    agent: Any
+    """ The agent (BaseAgent) to monitor, not validated so the agent isn't copied"""
+    sample_interval: float = 0.5
+    """ Seconds between two samples"""
+    report_interval: Optional[float] = 60
+    """ Seconds between two provision logs (None disables them)"""
+    lag_warning: float = 0.25
+    """ Loop lag (in seconds) above which a warning is logged"""
+    history_size: int = 120
+    transports: List[Any] = Field(default_factory=list)
+    """ Further transports with queue_depths (e.g. of postmans) to sample"""
+
+    _history: Deque[MonitorSample] = PrivateAttr(default_factory=deque)
+
+    def sample(self, loop_lag: float = 0) -> MonitorSample:
+        """Takes a sample of the queue depths and actors (without the loop lag)"""
+        queues = {}
+        for i, transport in enumerate([self.agent.transport] + self.transports):
+            if hasattr(transport, "queue_depths"):
+                prefix = "" if i == 0 else f"{type(transport).__name__}."
+                for key, depth in transport.queue_depths().items():
+                    queues[f"{prefix}{key}"] = depth
+
+        actors = []
+        for actor in list(self.agent.managed_actors.values()):
+            entries = actor.tracked_entries()
+            actors.append(
+                ActorSample(
+                    provision=actor.passport.provision,
+                    inbox=entries["inbox"],
+                    running_tasks=entries["running_tasks"],
+                    waiting_assignments=entries["waiting_assignments"],
+                )
+            )
+
+        return MonitorSample(loop_lag=loop_lag, queues=queues, actors=actors)
+
+    @property
+    def latest(self) -> Optional[MonitorSample]:
+        return self._history[-1] if self._history else None
+
+    def history(self) -> List[MonitorSample]:
+        return list(self._history)
+
+    def max_loop_lag(self) -> float:
+        """The highest loop lag in the history"""
+        return max((sample.loop_lag for sample in self._history), default=0)
+
+    async def areport(self):
+        """Logs a summary of the latest sample to the provisions of the actors"""
+        sample = self.latest
+        if sample is None:
+            return
+
+        queues = ", ".join(f"{key}: {depth}" for key, depth in sample.queues.items())
+        for actor in sample.actors:
+            message = (
+                f"Loop lag {sample.loop_lag * 1000:.1f}ms (max"
+                f" {self.max_loop_lag() * 1000:.1f}ms), inbox {actor.inbox}, running"
+                f" {actor.running_tasks}, waiting {actor.waiting_assignments}"
+                + (f", {queues}" if queues else "")
+            )
+            try:
+                await self.agent.transport.log_to_provision(
+                    actor.provision, level=LogLevelInput.INFO, message=message
+                )
+            except Exception:
+                logger.warning("Could not log monitor report", exc_info=True)
+
+    async def arun(self, context: Optional[Dict[str, Any]] = None):
+        loop = asyncio.get_running_loop()
+        last_report = loop.time()
+
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.sample_interval)
+            loop_lag = max(0, loop.time() - start - self.sample_interval)
+
+            self._history.append(self.sample(loop_lag))
+            while len(self._history) > self.history_size:
+                self._history.popleft()
+
+            if loop_lag > self.lag_warning:
+                logger.warning(
+                    f"Event loop lagged {loop_lag * 1000:.1f}ms, something is"
+                    " blocking the loop"
+                )
+
+            if (
+                self.report_interval is not None
+                and loop.time() - last_report >= self.report_interval
+            ):
+                last_report = loop.time()
+                await self.areport()
+
+    class Config:
+        arbitrary_types_allowed = True
+        underscore_attrs_are_private = True
+
+
+def register_monitor(
+    agent: BaseAgent,
+    name: str = "agent_monitor",
+    registry: Optional[HooksRegistry] = None,
+    **kwargs,
+) -> AgentMonitor:
+    """Registers an AgentMonitor for the agent as a background task
+
+    Args:
+        agent (BaseAgent): The agent to monitor
+        name (str, optional): The name of the background task. Defaults to "agent_monitor".
+        registry (HooksRegistry, optional): Defaults to the hook registry of the agent.
+
+    Returns:
+        AgentMonitor: The monitor, to pull samples from
+    """
+    monitor = AgentMonitor(agent=agent, **kwargs)
+    registry = registry or agent.hook_registry
+    registry.register_background(name, monitor)
+    return monitor
@@ -0,0 +1,144 @@
+import json
+import logging
+import os
+import tempfile
+from typing import Dict, Optional, Tuple
+
+from rekuest.api.schema import TemplateFragment
+
+logger = logging.getLogger(__name__)
+
+
+class TemplateCache:
+    """A cache of the templates that arkitekt created for our definitions
+
+    Templates are stored per instance and interface together with the hash of
+    the definition they were created from. If the definition didn't change
+    (i.e. has the same hash), the agent can reuse the template instead of
+    creating it again.
+
+    Templates are also indexed by their id, so the agent can look up the
+    template of a provision without a round trip to arkitekt.
+
+    If a path is given, the cache is loaded from (and saved to) a JSON file at
+    that path, so unchanged templates are not recreated on the next start.
+
+    Args:
+        path (str, optional): A path for a JSON file. Defaults to None (in memory).
+    """
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._templates: Dict[str, Tuple[str, TemplateFragment]] = {}
+        self._templates_by_id: Dict[str, TemplateFragment] = {}
+        self._loaded = False
+
+    @staticmethod
+    def _key(instance_id: str, interface: str) -> str:
+        return f"{instance_id}:{interface}"
+
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        if self.path is None or not os.path.exists(self.path):
+            return
+
+        try:
+            with open(self.path, "r") as f:
+                stored = json.load(f)
+            for key, (definition_hash, template) in stored.items():
+                template = TemplateFragment.parse_obj(template)
+                self._templates[key] = (definition_hash, template)
+                self._templates_by_id[template.id] = template
+        except Exception:
+            logger.warning(
+                f"Ignoring corrupt template cache {self.path}", exc_info=True
+            )
+            self._templates = {}
+            self._templates_by_id = {}
+
+    def get(
+        self, instance_id: str, interface: str, definition_hash: str
+    ) -> Optional[TemplateFragment]:
+        """Returns the template if it was created from the same definition"""
+        self._load()
+        entry = self._templates.get(self._key(instance_id, interface))
+        if entry is not None and entry[0] == definition_hash:
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        return None
+
+    def put(
+        self,
+        instance_id: str,
+        interface: str,
+        definition_hash: str,
+        template: TemplateFragment,
+    ) -> None:
+        self._load()
+        key = self._key(instance_id, interface)
+        previous = self._templates.get(key)
+        if previous is not None and previous[1].id != template.id:
+            # The definition changed, so the old template is no longer ours
+            self._templates_by_id.pop(previous[1].id, None)
+
+        self._templates[key] = (definition_hash, template)
+        self._templates_by_id[template.id] = template
+
+    def get_by_id(self, id: str) -> Optional[TemplateFragment]:
+        """Returns a known template by its id (without asking arkitekt)"""
+        self._load()
+        template = self._templates_by_id.get(id)
+        if template is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return template
+
+    def remember(self, template: TemplateFragment) -> None:
+        """Keeps a template that was retrieved from arkitekt (by id)"""
+        self._load()
+        self._templates_by_id[template.id] = template
+
+    def invalidate(self, id: str) -> None:
+        """Forgets a template"""
+        self._load()
+        self._templates_by_id.pop(id, None)
+        self._templates = {
+            key: entry for key, entry in self._templates.items() if entry[1].id != id
+        }
+
+    def save(self) -> None:
+        """Writes the cache to its path (if it has one)"""
+        if self.path is None:
+            return
+
+        stored = {
+            key: (definition_hash, json.loads(template.json(by_alias=True)))
+            for key, (definition_hash, template) in self._templates.items()
+        }
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        # Writing to a temporary file first, so a crash never leaves a partial file
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(stored, f)
+            os.replace(tmp, self.path)
+        except Exception:
+            logger.warning(f"Could not save template cache {self.path}", exc_info=True)
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def clear(self) -> None:
+        self._templates = {}
+        self._templates_by_id = {}
+        self._loaded = True
+        if self.path is not None and os.path.exists(self.path):
+            os.remove(self.path)
@@ -2,7 +2,7 @@
 import uuid
 from datetime import datetime
 from enum import Enum
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 
 from typing_extensions import Literal
 from rekuest.api.schema import AssignationStatus, ProvisionMode, ProvisionStatus
@@ -16,6 +16,7 @@ from rekuest.messages import (
     Inquiry,
 )
 from pydantic import BaseModel, Field
+from rekuest.codecs import Codec, Frame
 
 
 class AgentMessageTypes(str, Enum):
@@ -33,6 +34,18 @@ class AgentMessageTypes(str, Enum):
     LIST_PROVISIONS_REPLY = "LIST_PROVISIONS_REPLY"
     LIST_PROVISIONS_DENIED = "LIST_PROVISIONS_DENIED"
 
+    BATCH = "BATCH"
+    ACK = "ACK"
+
+
+class AgentFeatures(str, Enum):
+    """Features a server can advertise in its HELLO message"""
+
+    BATCH = "BATCH"
+    ACK = "ACK"
+    DEFLATE = "DEFLATE"
+    ZSTD = "ZSTD"
+
 
 class AgentSubMessageTypes(str, Enum):
     HELLO = "HELLO"
@@ -45,6 +58,8 @@ class AgentSubMessageTypes(str, Enum):
 
 class JSONMeta(BaseModel):
     timestamp: datetime = Field(default_factory=datetime.utcnow)
+    seq: Optional[int]
+    """ The sequence number of a message sent by the agent (see ReplayBuffer)"""
 
 
 class JSONMessage(BaseModel):
@@ -53,6 +68,40 @@ class JSONMessage(BaseModel):
     meta: JSONMeta = Field(default_factory=JSONMeta)
 
 
+class HelloSubMessage(JSONMessage):
+    type: Literal[AgentSubMessageTypes.HELLO] = AgentSubMessageTypes.HELLO
+    features: Optional[List[str]]
+
+
+class BatchMessage(JSONMessage):
+    """A batch of messages that are sent in one frame
+
+    Messages are kept as dicts, so that both directions can batch every
+    message type.
+    """
+
+    type: Literal[AgentMessageTypes.BATCH] = AgentMessageTypes.BATCH
+    messages: List[Dict[str, Any]] = Field(default_factory=list)
+
+
+class AckMessage(JSONMessage):
+    """Acknowledges all agent messages up to (and including) seq"""
+
+    type: Literal[AgentMessageTypes.ACK] = AgentMessageTypes.ACK
+    seq: int
+
+
+def encode_batch(messages: List[Frame], codec: Optional[Codec] = None) -> Frame:
+    """Encodes already encoded messages as one batch message
+
+    The messages are spliced into the envelope as they are, so they don't
+    need to be decoded again.
+    """
+    codec = codec or Codec()
+    envelope = BatchMessage().dict(exclude={"messages"})
+    return codec.encode_envelope(envelope, "messages", messages)
+
+
 class AssignationsList(JSONMessage):
     type: Literal[
         AgentMessageTypes.LIST_ASSIGNATIONS
@@ -0,0 +1,103 @@
+import logging
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from rekuest.agents.transport.protocols.agent_json import JSONMessage
+
+logger = logging.getLogger(__name__)
+
+
+class ReplayBuffer:
+    """A bounded buffer of the messages an agent sent, to resend after a reconnect
+
+    Every message gets a sequence number (in its meta) when it is sent. If the
+    server acknowledges sequence numbers (ACK feature), messages are kept until
+    they are acknowledged and all unacknowledged messages are replayed after a
+    reconnect. Otherwise the buffer can't know what arrived, so nothing is
+    replayed, unless a replay_window is set: then the messages that were sent
+    in the last replay_window seconds before the connection dropped are
+    replayed (which duplicates those that did arrive). Replayed messages keep
+    their id, so the server can discard duplicates.
+
+    Args:
+        maxsize (int, optional): The maximum number of buffered messages. Defaults to 1000.
+        replay_window (float, optional): Seconds of messages to replay without acknowledgements. Defaults to 0.
+    """
+
+    def __init__(self, maxsize: int = 1000, replay_window: float = 0) -> None:
+        self.maxsize = maxsize
+        self.replay_window = replay_window
+        self.acknowledged = False
+        self.sent = 0
+        self.replayed = 0
+        self.lost = 0
+        self._sequence = 0
+        self._buffer: Deque[Tuple[int, float, JSONMessage]] = deque()
+        self._disconnected_at: Optional[float] = None
+
+    def _is_replayable(self, sent_at: float) -> bool:
+        if self.acknowledged:
+            return True
+        if not self.replay_window:
+            return False
+        reference = self._disconnected_at or time.monotonic()
+        return sent_at >= reference - self.replay_window
+
+    def add(self, message: JSONMessage) -> None:
+        """Buffers a message that is about to be sent (for the first time)"""
+        self._sequence += 1
+        message.meta.seq = self._sequence
+        self.sent += 1
+        if not self.acknowledged and not self.replay_window:
+            return  # Would never be replayed
+
+        self._buffer.append((self._sequence, time.monotonic(), message))
+
+        while len(self._buffer) > self.maxsize:
+            _, sent_at, evicted = self._buffer.popleft()
+            if self._is_replayable(sent_at):
+                # Would have been replayed, if the connection dropped now
+                self.lost += 1
+                logger.debug(f"Replay buffer is full, dropped {evicted.id}")
+
+    def discard(self, message: JSONMessage) -> None:
+        """Forgets the last added message (e.g. if it could not be encoded)"""
+        if self._buffer and self._buffer[-1][2] is message:
+            self._buffer.pop()
+        self.sent -= 1
+
+    def ack(self, seq: int) -> None:
+        """Forgets all messages up to (and including) this sequence number"""
+        while self._buffer and self._buffer[0][0] <= seq:
+            self._buffer.popleft()
+
+    def mark_disconnected(self) -> None:
+        if self._disconnected_at is None:
+            self._disconnected_at = time.monotonic()
+
+    def replay(self) -> List[JSONMessage]:
+        """Returns the messages to resend on a new connection (oldest first)"""
+        if self._disconnected_at is None:
+            return []
+
+        messages = [
+            message
+            for _, sent_at, message in self._buffer
+            if self._is_replayable(sent_at)
+        ]
+        self._disconnected_at = None
+        self.replayed += len(messages)
+        return messages
+
+    def metrics(self) -> Dict[str, int]:
+        """Counts of sent, replayed and lost messages (and the buffered ones)"""
+        return {
+            "sent": self.sent,
+            "replayed": self.replayed,
+            "lost": self.lost,
+            "buffered": len(self._buffer),
+        }
+
+    def __len__(self) -> int:
+        return len(self._buffer)
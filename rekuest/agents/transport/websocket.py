@@ -1,14 +1,23 @@
-from typing import Awaitable, Callable, Dict, Any, Union
+from typing import Awaitable, Callable, Dict, Any, List, Optional, Union
 import websockets
 from rekuest.agents.transport.base import AgentTransport
 import asyncio
-import json
+import random
+from pydantic import Field, PrivateAttr
 from rekuest.agents.transport.errors import (
     AgentTransportException,
     AssignationListDeniedError,
     ProvisionListDeniedError,
 )
 from rekuest.agents.transport.protocols.agent_json import *
+from rekuest.agents.transport.replay import ReplayBuffer
+from rekuest.compression import (
+    Compressor,
+    compress_frame,
+    decompress_frame,
+    get_compressor,
+)
+from rekuest.codecs import Codec, Frame, get_codec, get_default_codec, negotiate_codec
 import logging
 from websockets.exceptions import (
     ConnectionClosedError,
@@ -63,8 +72,30 @@ class WebsocketAgentTransport(AgentTransport):
     token_loader: Callable[[], Awaitable[str]] = Field(exclude=True)
     max_retries = 5
     time_between_retries = 3
+    """ Seconds to wait before the first retry, doubled for every further retry"""
+    max_time_between_retries: float = 30
+    retry_jitter: float = 0.5
+    """ The fraction of the retry delay that is randomized"""
+    replay_buffer_size: int = 1000
+    """ The maximum number of sent messages kept to replay after a reconnect"""
+    replay_window: float = 0
+    """ Seconds of sent messages to replay, if the server doesn't acknowledge messages.
+    Defaults to 0 (no replay), as the server might have received them already"""
+    compression: Optional[str] = None
+    """ Compress frames above compression_threshold with this method (deflate or zstd), if the server supports it"""
+    compression_threshold: int = 16 * 1024
+    """ Frames up to this size (in bytes) are sent uncompressed"""
+    permessage_deflate: Optional[bool] = None
+    """ Negotiate permessage-deflate, which compresses every message (defaults to True, unless compression is set)"""
     allow_reconnect = True
     auto_connect = True
+    batch_messages: bool = True
+    """ Send queued messages in one BATCH frame (if the server supports it)"""
+    batch_max_size: int = 50
+    batch_max_delay: float = 0.005
+    """ Seconds to wait for more messages before sending a batch"""
+    codec: Optional[str] = None
+    """ The codec to encode messages with (see rekuest.codecs), defaults to json"""
 
     _futures: Contextual[Dict[str, asyncio.Future]] = None
     _connected: ContextBool = False
@@ -73,11 +104,23 @@ class WebsocketAgentTransport(AgentTransport):
     _in_queue: Contextual[asyncio.Queue] = None
     _connection_task: Contextual[asyncio.Task] = None
     _connected_future: Contextual[asyncio.Future]
+    _batching_supported: ContextBool = False
+    _codec: Codec = PrivateAttr(default_factory=get_default_codec)
+    _replay_buffer: ReplayBuffer = PrivateAttr(default_factory=ReplayBuffer)
+    _reconnects: int = 0
+    _compressor: Contextual[Compressor] = None
+    _callback: Contextual[Any] = None
 
     async def __aenter__(self):
         self._futures = {}
 
     async def aconnect(self, instance_id: str):
+        self._codec = get_codec(self.codec)
+        if self.compression is not None:
+            get_compressor(self.compression)  # Fails early if not available
+        self._replay_buffer = ReplayBuffer(
+            maxsize=self.replay_buffer_size, replay_window=self.replay_window
+        )
         self._send_queue = asyncio.Queue()
         self._in_queue = asyncio.Queue()
         self._connected_future = asyncio.Future()
@@ -87,123 +130,269 @@ class WebsocketAgentTransport(AgentTransport):
     async def on_definite_error(self, e: Exception):
         if not self._connected_future.done():
             self._connected_future.set_exception(e)
-        else:
+        elif self._callback is not None:
             return await self._callback.on_definite_error(e)
+        else:
+            await self.abroadcast(e)
 
     async def abroadcast(self, message):
         await self._in_queue.put(message)
 
-    async def websocket_loop(self, instance_id: str, retry=0, reload_token=False):
-        send_task = None
-        receive_task = None
-        try:
+    def retry_delay(self, retry: int) -> float:
+        """The seconds to wait before a retry (exponential backoff with jitter)"""
+        delay = min(
+            self.time_between_retries * 2**retry, self.max_time_between_retries
+        )
+        return delay * random.uniform(1 - self.retry_jitter, 1)
+
+    def queue_depths(self) -> Dict[str, int]:
+        """The number of messages waiting to be sent and to be processed"""
+        return {
+            "send_queue": self._send_queue.qsize()
+            if self._send_queue is not None
+            else 0,
+            "in_queue": self._in_queue.qsize() if self._in_queue is not None else 0,
+        }
+
+    def metrics(self) -> Dict[str, int]:
+        """Counts of sent, replayed and lost messages, and of reconnects"""
+        return {**self._replay_buffer.metrics(), "reconnects": self._reconnects}
+
+    async def websocket_loop(self, instance_id: str):
+        retry = 0
+        reload_token = False
+
+        while True:
+            send_task = None
+            receive_task = None
             try:
-                token = await self.token_loader(force_refresh=reload_token)
-
-                async with websockets.connect(
-                    f"{self.endpoint_url}?token={token}&instance_id={instance_id}",
-                    ssl=(
-                        self.ssl_context
-                        if self.endpoint_url.startswith("wss")
-                        else None
-                    ),
-                ) as client:
-                    retry = 0
-                    logger.info("Agent on Websockets connected")
-
-                    send_task = asyncio.create_task(self.sending(client))
-                    receive_task = asyncio.create_task(self.receiving(client))
-
-                    self._healthy = True
-                    done, pending = await asyncio.wait(
-                        [send_task, receive_task],
-                        return_when=asyncio.FIRST_EXCEPTION,
+                try:
+                    token = await self.token_loader(force_refresh=reload_token)
+                    codec = get_codec(self.codec)
+
+                    async with websockets.connect(
+                        f"{self.endpoint_url}?token={token}&instance_id={instance_id}",
+                        ssl=(
+                            self.ssl_context
+                            if self.endpoint_url.startswith("wss")
+                            else None
+                        ),
+                        subprotocols=(
+                            [codec.subprotocol] if codec.subprotocol else None
+                        ),
+                        compression="deflate"
+                        if self.uses_permessage_deflate()
+                        else None,
+                    ) as client:
+                        if retry > 0:
+                            self._reconnects += 1
+                        retry = 0
+                        reload_token = False
+                        self._codec = negotiate_codec(codec, client.subprotocol)
+                        logger.info("Agent on Websockets connected")
+
+                        send_task = asyncio.create_task(self.sending(client))
+                        receive_task = asyncio.create_task(self.receiving(client))
+
+                        self._healthy = True
+                        done, pending = await asyncio.wait(
+                            [send_task, receive_task],
+                            return_when=asyncio.FIRST_EXCEPTION,
+                        )
+                        self._healthy = False
+
+                        for task in pending:
+                            task.cancel()
+
+                        for task in done:
+                            raise task.exception()
+
+                except InvalidHandshake as e:
+                    logger.warning(
+                        (
+                            "Websocket to"
+                            f" {self.endpoint_url}?token={token}&instance_id={instance_id} was"
+                            " denied. Trying to reload token"
+                        ),
+                        exc_info=True,
                     )
-                    self._healthy = False
-
-                    for task in pending:
-                        task.cancel()
-
-                    for task in done:
-                        raise task.exception()
-
-            except InvalidHandshake as e:
-                logger.warning(
-                    (
-                        "Websocket to"
-                        f" {self.endpoint_url}?token={token}&instance_id={instance_id} was"
-                        " denied. Trying to reload token"
-                    ),
-                    exc_info=True,
+                    reload_token = True
+                    raise CorrectableConnectionFail from e
+
+                except ConnectionClosedError as e:
+                    logger.warning("Websocket was closed", exc_info=True)
+                    if e.code in agent_error_codes:
+                        await self.abroadcast(
+                            agent_error_codes[e.code](agent_error_message[e.code])
+                        )
+                        raise AgentTransportException("Agent Error") from e
+
+                    if e.code == BOUNCED_CODE:
+                        raise CorrectableConnectionFail(
+                            "Was bounced. Debug call to reconnect"
+                        ) from e
+
+                    else:
+                        raise CorrectableConnectionFail(
+                            "Connection failed unexpectably. Reconnectable."
+                        ) from e
+
+                except Exception as e:
+                    logger.error("Websocket excepted closed definetely", exc_info=True)
+                    await self.on_definite_error(DefiniteConnectionFail(str(e)))
+                    logger.critical("Unhandled exception... ", exc_info=True)
+                    raise DefiniteConnectionFail from e
+
+            except CorrectableConnectionFail as e:
+                logger.info(f"Trying to Recover from Exception {e}")
+                self._healthy = False
+                self._replay_buffer.mark_disconnected()
+                # Negotiated in the HELLO of the next connection again
+                self._batching_supported = False
+                self._compressor = None
+
+                should_retry = (
+                    await self._callback.on_correctable_error(e)
+                    if self._callback is not None
+                    else True
                 )
-                reload_token = True
-                raise CorrectableConnectionFail from e
-
-            except ConnectionClosedError as e:
-                logger.warning("Websocket was closed", exc_info=True)
-                if e.code in agent_error_codes:
-                    await self.abroadcast(
-                        agent_error_codes[e.code](agent_error_message[e.code])
+
+                if (
+                    retry > self.max_retries
+                    or not self.allow_reconnect
+                    or not should_retry
+                ):
+                    logger.error("Max retries reached. Giving up")
+                    raise DefiniteConnectionFail("Exceeded Number of Retries")
+
+                delay = self.retry_delay(retry)
+                retry += 1
+                logger.info(f"Waiting for some time before retrying: {delay:.2f}")
+                await asyncio.sleep(delay)
+                logger.info("Retrying to connect")
+
+            except asyncio.CancelledError as e:
+                logger.info("Websocket got cancelled. Trying to shutdown graceully")
+                if send_task and receive_task:
+                    send_task.cancel()
+                    receive_task.cancel()
+
+                await asyncio.gather(send_task, receive_task, return_exceptions=True)
+                raise e
+
+    async def acollect_batch(self) -> List[JSONMessage]:
+        """Collects queued messages until the batch is full or the delay passed"""
+        batch = [await self._send_queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.batch_max_delay
+
+        while len(batch) < self.batch_max_size:
+            try:
+                batch.append(self._send_queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(
+                    await asyncio.wait_for(self._send_queue.get(), timeout=remaining)
+                )
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    def uses_permessage_deflate(self) -> bool:
+        if self.permessage_deflate is not None:
+            return self.permessage_deflate
+        # Compressing small messages is not worth it, and large ones are
+        # compressed by the application level compression
+        return self.compression is None
+
+    def encode(self, message: JSONMessage) -> Optional[Frame]:
+        """Encodes a message, reporting it if it can't be encoded (returns None)
+
+        A message that can't be encoded (e.g. returns the codec doesn't
+        support) is dropped. If it was an assignation change, the assignation
+        is set to CRITICAL instead, so it doesn't stall the other messages.
+        """
+        try:
+            return self._codec.encode(message)
+        except Exception as e:
+            logger.error(f"Could not encode message {message.id}", exc_info=True)
+            if (
+                isinstance(message, AssignationChangedMessage)
+                and message.status != AssignationStatus.CRITICAL
+            ):
+                self._send_queue.put_nowait(
+                    AssignationChangedMessage(
+                        assignation=message.assignation,
+                        status=AssignationStatus.CRITICAL,
+                        message=f"Could not encode message: {e}",
                     )
-                    raise AgentTransportException("Agent Error") from e
+                )
+            return None
 
-                if e.code == BOUNCED_CODE:
-                    raise CorrectableConnectionFail(
-                        "Was bounced. Debug call to reconnect"
-                    ) from e
+    async def asend(self, client, frames: List[Frame]):
+        if not frames:
+            return
 
-                else:
-                    raise CorrectableConnectionFail(
-                        "Connection failed unexpectably. Reconnectable."
-                    ) from e
-
-            except Exception as e:
-                logger.error("Websocket excepted closed definetely", exc_info=True)
-                await self.on_definite_error(DefiniteConnectionFail(str(e)))
-                logger.critical("Unhandled exception... ", exc_info=True)
-                raise DefiniteConnectionFail from e
-
-        except CorrectableConnectionFail as e:
-            logger.info(f"Trying to Recover from Exception {e}")
-
-            should_retry = await self._callback.on_correctable_error(e)
-
-            if retry > self.max_retries or not self.allow_reconnect or not should_retry:
-                logger.error("Max retries reached. Giving up")
-                raise DefiniteConnectionFail("Exceeded Number of Retries")
-
-            logger.info(
-                f"Waiting for some time before retrying: {self.time_between_retries}"
-            )
-            await asyncio.sleep(self.time_between_retries)
-            logger.info("Retrying to connect")
-            await self.websocket_loop(
-                instance_id, retry=retry + 1, reload_token=reload_token
-            )
-
-        except asyncio.CancelledError as e:
-            logger.info("Websocket got cancelled. Trying to shutdown graceully")
-            if send_task and receive_task:
-                send_task.cancel()
-                receive_task.cancel()
-
-            await asyncio.gather(send_task, receive_task, return_exceptions=True)
-            raise e
+        if len(frames) == 1:
+            logger.debug(">>>> %s", frames[0])
+            frame = frames[0]
+        else:
+            logger.debug(f">>>> Batch of {len(frames)} messages")
+            frame = encode_batch(frames, codec=self._codec)
+
+        if self._compressor is not None:
+            frame = compress_frame(frame, self._compressor, self.compression_threshold)
+
+        await client.send(frame)
 
     async def sending(self, client):
         try:
+            replayed = self._replay_buffer.replay()
+            if replayed:
+                logger.info(f"Replaying {len(replayed)} messages after reconnect")
+                frames = [self.encode(message) for message in replayed]
+                frames = [frame for frame in frames if frame is not None]
+                if self.batch_messages and self._batching_supported:
+                    for i in range(0, len(frames), self.batch_max_size):
+                        await self.asend(client, frames[i : i + self.batch_max_size])
+                else:
+                    for frame in frames:
+                        await self.asend(client, [frame])
+
             while True:
-                message = await self._send_queue.get()
-                logger.debug(f">>>> {message}")
-                await client.send(message)
-                self._send_queue.task_done()
+                if self.batch_messages and self._batching_supported:
+                    messages = await self.acollect_batch()
+                else:
+                    messages = [await self._send_queue.get()]
+
+                try:
+                    frames = []
+                    for message in messages:
+                        # Buffered before sending, so a failed send is replayed
+                        self._replay_buffer.add(message)
+                        frame = self.encode(message)
+                        if frame is None:
+                            self._replay_buffer.discard(message)
+                        else:
+                            frames.append(frame)
+
+                    await self.asend(client, frames)
+                finally:
+                    for _ in messages:
+                        self._send_queue.task_done()
         except asyncio.CancelledError:
             logger.info("Sending Task sucessfully Cancelled")
 
     async def receiving(self, client):
         try:
             async for message in client:
-                logger.info(f"Receiving message {message}")
                 await self.receive(message)
 
         except asyncio.CancelledError:
@@ -220,14 +409,34 @@ class WebsocketAgentTransport(AgentTransport):
         return x
 
     async def receive(self, message):
-        json_dict = json.loads(message)
-        logger.debug(f"<<<< {message}")
+        json_dict = self._codec.loads(decompress_frame(message))
+        logger.debug("<<<< %s", message)
+        await self.receive_json(json_dict)
+
+    async def receive_json(self, json_dict: Dict[str, Any]):
         if "type" in json_dict:
             type = json_dict["type"]
-            id = json_dict["id"]
+
+            if type == AgentMessageTypes.ACK:
+                self._replay_buffer.ack(AckMessage(**json_dict).seq)
+
+            if type == AgentMessageTypes.BATCH:
+                for inner in BatchMessage(**json_dict).messages:
+                    await self.receive_json(inner)
 
             # State Layer
             if type == AgentSubMessageTypes.HELLO:
+                hello = HelloSubMessage(**json_dict)
+                self._batching_supported = AgentFeatures.BATCH in (hello.features or [])
+                self._replay_buffer.acknowledged = AgentFeatures.ACK in (
+                    hello.features or []
+                )
+                self._compressor = (
+                    get_compressor(self.compression)
+                    if self.compression is not None
+                    and self.compression.upper() in (hello.features or [])
+                    else None
+                )
                 if not self._connected_future.done():
                     self._connected_future.set_result(True)
 
@@ -235,7 +444,7 @@ class WebsocketAgentTransport(AgentTransport):
                 await self.abroadcast(InquirySubMessage(**json_dict))
 
             if type == AgentSubMessageTypes.ASSIGN:
-                await self.abroadcast(AssignSubMessage(**json_dict))
+                await self.abroadcast(AssignSubMessage.parse_lazy(json_dict))
 
             if type == AgentSubMessageTypes.UNASSIGN:
                 await self.abroadcast(UnassignSubMessage(**json_dict))
@@ -297,7 +506,7 @@ class WebsocketAgentTransport(AgentTransport):
 
     async def delayaction(self, action: JSONMessage):
         assert self._connected, "Should be connected"
-        await self._send_queue.put(action.json())
+        await self._send_queue.put(action)
 
     async def adisconnect(self):
         if self._connection_task:
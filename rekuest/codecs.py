@@ -0,0 +1,166 @@
+"""Codecs for the websocket protocols of agents and postmans
+
+A codec encodes the messages of a protocol to websocket frames and decodes
+received frames to dicts. The json and orjson codecs produce the same
+(text) wire format, so they can be swapped without asking the server.
+json is the default. orjson is faster, but needs to be chosen explicitly.
+It rejects some values that json accepts (e.g. non str dict keys or ints
+beyond 64 bits), and those messages are encoded with json instead. The
+msgpack codec sends binary frames and needs to be negotiated with the
+server (through the websocket subprotocol) when connecting.
+
+orjson and msgpack are optional dependencies, get_codec raises a
+CodecException if they are not installed.
+"""
+import json
+import logging
+from typing import Any, Dict, List, Optional, Union
+
+from pydantic import BaseModel
+from pydantic.json import pydantic_encoder
+
+logger = logging.getLogger(__name__)
+
+Frame = Union[str, bytes]
+
+
+class CodecException(Exception):
+    pass
+
+
+class Codec:
+    """The stdlib json codec (and the interface of all codecs)"""
+
+    name = "json"
+    subprotocol: Optional[str] = None
+    """ The websocket subprotocol to negotiate (None for the default json wire format)"""
+
+    def dumps(self, data: Any) -> Frame:
+        return json.dumps(data, default=pydantic_encoder)
+
+    def loads(self, frame: Frame) -> Any:
+        return json.loads(frame)
+
+    def encode(self, message: BaseModel) -> Frame:
+        """Encodes a protocol message to a frame"""
+        return message.json()
+
+    def encode_envelope(
+        self, envelope: Dict[str, Any], field: str, frames: List[Frame]
+    ) -> Frame:
+        """Encodes the envelope with already encoded frames as a list in field
+
+        The frames are spliced into the envelope, so they don't need to be
+        decoded again.
+        """
+        encoded = self.dumps(envelope)
+        separator = "," if envelope else ""
+        return f'{encoded[:-1]}{separator}"{field}":[{",".join(frames)}]}}'
+
+
+class OrjsonCodec(Codec):
+    """Same wire format as the json codec, but encoded and decoded with orjson
+
+    Falls back to json for data that orjson can't encode.
+    """
+
+    name = "orjson"
+
+    def __init__(self) -> None:
+        try:
+            import orjson
+        except ImportError as e:
+            raise CodecException(
+                "The orjson codec needs orjson to be installed (pip install orjson)"
+            ) from e
+        self._orjson = orjson
+
+    def dumps(self, data: Any) -> Frame:
+        try:
+            # Frames stay text frames, as the server expects json as text
+            return self._orjson.dumps(data, default=pydantic_encoder).decode()
+        except (TypeError, OverflowError):
+            return super().dumps(data)
+
+    def loads(self, frame: Frame) -> Any:
+        return self._orjson.loads(frame)
+
+    def encode(self, message: BaseModel) -> Frame:
+        return self.dumps(message.dict())
+
+
+class MsgpackCodec(Codec):
+    """A binary codec, that needs the server to support the msgpack subprotocol"""
+
+    name = "msgpack"
+    subprotocol = "rekuest.msgpack"
+
+    def __init__(self) -> None:
+        try:
+            import msgpack
+        except ImportError as e:
+            raise CodecException(
+                "The msgpack codec needs msgpack to be installed (pip install msgpack)"
+            ) from e
+        self._msgpack = msgpack
+
+    def dumps(self, data: Any) -> Frame:
+        return self._msgpack.packb(data, default=pydantic_encoder)
+
+    def loads(self, frame: Frame) -> Any:
+        return self._msgpack.unpackb(frame, raw=False)
+
+    def encode(self, message: BaseModel) -> Frame:
+        return self.dumps(message.dict())
+
+    def encode_envelope(
+        self, envelope: Dict[str, Any], field: str, frames: List[Frame]
+    ) -> Frame:
+        packer = self._msgpack.Packer(default=pydantic_encoder)
+        encoded = packer.pack_map_header(len(envelope) + 1)
+        for key, value in envelope.items():
+            encoded += packer.pack(key) + packer.pack(value)
+        encoded += packer.pack(field) + packer.pack_array_header(len(frames))
+        return encoded + b"".join(frames)
+
+
+CODECS = {
+    Codec.name: Codec,
+    OrjsonCodec.name: OrjsonCodec,
+    MsgpackCodec.name: MsgpackCodec,
+}
+
+
+def get_default_codec() -> Codec:
+    return Codec()
+
+
+def get_codec(name: Optional[str] = None) -> Codec:
+    """Returns the codec with this name (None for the default codec)
+
+    Raises:
+        CodecException: If the codec is unknown or its dependency is not installed
+    """
+    if name is None:
+        return get_default_codec()
+
+    if name not in CODECS:
+        raise CodecException(
+            f"Unknown codec {name}. Available codecs are {list(CODECS.keys())}"
+        )
+    return CODECS[name]()
+
+
+def negotiate_codec(codec: Codec, subprotocol: Optional[str]) -> Codec:
+    """The codec to use after the server selected a subprotocol
+
+    Falls back to the default codec if the server didn't agree to the
+    subprotocol of the codec.
+    """
+    if codec.subprotocol is None or codec.subprotocol == subprotocol:
+        return codec
+
+    logger.warning(
+        f"Server does not support the {codec.name} codec. Falling back to json"
+    )
+    return get_default_codec()
@@ -0,0 +1,110 @@
+"""Application level compression of websocket frames
+
+Large frames (e.g. assignations with big returns) can be compressed before
+they are sent. A compressed frame is a binary frame that starts with a one
+byte tag of the method (deflate or zstd), followed by the compressed
+encoded frame. Frames of all codecs start with something else (a json text
+frame is not binary and a msgpack message is a map), so compressed frames
+can always be told apart when receiving.
+
+Unlike permessage-deflate (which compresses every message once negotiated),
+only frames above a threshold are compressed, so small status updates are
+not penalized.
+
+zstd needs the optional zstandard dependency.
+"""
+import zlib
+from typing import Dict, Optional
+
+from rekuest.codecs import Frame
+
+
+class CompressionException(Exception):
+    pass
+
+
+class Compressor:
+    """Compresses frames with zlib (deflate)"""
+
+    name = "deflate"
+    tag = b"\x01"
+
+    def __init__(self, level: int = 6) -> None:
+        self.level = level
+
+    def compress(self, data: bytes) -> bytes:
+        return zlib.compress(data, self.level)
+
+    def decompress(self, data: bytes) -> bytes:
+        return zlib.decompress(data)
+
+
+class ZstdCompressor(Compressor):
+    """Compresses frames with zstd (faster than deflate at similar ratios)"""
+
+    name = "zstd"
+    tag = b"\x02"
+
+    def __init__(self, level: int = 3) -> None:
+        try:
+            import zstandard
+        except ImportError as e:
+            raise CompressionException(
+                "zstd compression needs zstandard to be installed (pip install zstandard)"
+            ) from e
+        self.level = level
+        self._compressor = zstandard.ZstdCompressor(level=level)
+        self._decompressor = zstandard.ZstdDecompressor()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def decompress(self, data: bytes) -> bytes:
+        return self._decompressor.decompress(data)
+
+
+COMPRESSORS = {
+    Compressor.name: Compressor,
+    ZstdCompressor.name: ZstdCompressor,
+}
+
+TAGS = {compressor.tag: compressor for compressor in COMPRESSORS.values()}
+
+_decompressors: Dict[bytes, Compressor] = {}
+
+
+def get_compressor(name: str) -> Compressor:
+    """Returns the compressor with this name
+
+    Raises:
+        CompressionException: If the method is unknown or its dependency is not installed
+    """
+    if name not in COMPRESSORS:
+        raise CompressionException(
+            f"Unknown compression {name}. Available are {list(COMPRESSORS.keys())}"
+        )
+    return COMPRESSORS[name]()
+
+
+def compress_frame(
+    frame: Frame, compressor: Compressor, threshold: Optional[int] = None
+) -> Frame:
+    """Compresses the frame, if it is larger than the threshold (in bytes)"""
+    data = frame.encode() if isinstance(frame, str) else frame
+    if threshold is not None and len(data) <= threshold:
+        return frame
+    return compressor.tag + compressor.compress(data)
+
+
+def decompress_frame(frame: Frame) -> Frame:
+    """Decompresses the frame, if it is a compressed frame (else returns it as is)"""
+    if isinstance(frame, str) or not frame:
+        return frame
+
+    tag = frame[:1]
+    if tag not in TAGS:
+        return frame
+
+    if tag not in _decompressors:
+        _decompressors[tag] = TAGS[tag]()
+    return _decompressors[tag].decompress(frame[1:])
@@ -0,0 +1,305 @@
+import hashlib
+import inspect
+import json
+import logging
+import os
+import pickle
+import sys
+import tempfile
+import weakref
+from enum import Enum
+from typing import Any, Callable, Dict, Iterator, List, Optional, get_args
+
+from pydantic.json import pydantic_encoder
+
+from rekuest.api.schema import DefinitionInput, PortKindInput
+from rekuest.definition.utils import get_type_hints
+from rekuest.structures.errors import StructureRegistryError
+from rekuest.structures.registry import StructureRegistry
+
+logger = logging.getLogger(__name__)
+
+DEFINITION_CACHE_ENV = "REKUEST_DEFINITION_CACHE"
+""" Set this environment variable to a directory to enable the default definition cache"""
+
+GLOBAL_DEFINITION_CACHE = None
+
+
+def get_default_definition_cache() -> Optional["DefinitionCache"]:
+    """The definition cache used by prepare_definition (None if disabled)"""
+    global GLOBAL_DEFINITION_CACHE
+    if GLOBAL_DEFINITION_CACHE is None and os.environ.get(DEFINITION_CACHE_ENV):
+        GLOBAL_DEFINITION_CACHE = DefinitionCache(os.environ[DEFINITION_CACHE_ENV])
+    return GLOBAL_DEFINITION_CACHE
+
+
+def set_default_definition_cache(cache: Optional["DefinitionCache"]):
+    global GLOBAL_DEFINITION_CACHE
+    GLOBAL_DEFINITION_CACHE = cache
+
+
+def _package_version() -> str:
+    try:
+        from importlib.metadata import version
+
+        return version("rekuest")
+    except Exception:
+        return "unknown"
+
+
+def _iterate_structure_ports(ports: List[Any]) -> Iterator[Any]:
+    for port in ports:
+        while port is not None:
+            if port.kind == PortKindInput.STRUCTURE:
+                yield port
+            for variant in port.variants or []:
+                yield from _iterate_structure_ports([variant])
+            port = port.child
+
+
+def _class_path(cls: Any) -> str:
+    return f"{cls.__module__}.{cls.__qualname__}"
+
+
+_file_stamps: Dict[str, Any] = {}
+_type_fingerprints: "weakref.WeakKeyDictionary[type, Any]" = weakref.WeakKeyDictionary()
+_function_fingerprints: "weakref.WeakKeyDictionary[Callable, Any]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _file_stamp(path: Optional[str]) -> Any:
+    """The modification time and size of a source file (memoized, as modules
+    that are already imported don't change)"""
+    if path not in _file_stamps:
+        try:
+            stat = os.stat(path)
+            _file_stamps[path] = [path, stat.st_mtime_ns, stat.st_size]
+        except (OSError, TypeError):
+            _file_stamps[path] = None
+    return _file_stamps[path]
+
+
+def _fingerprint_type(cls: Any) -> Any:
+    """What of an annotated type ends up in a definition
+
+    Enums are fingerprinted by their members, other classes by the file they
+    are defined in (its modification time), typing constructs by their args.
+    """
+    args = get_args(cls)
+    if args:
+        return [repr(cls), [_fingerprint_type(arg) for arg in args]]
+
+    if not inspect.isclass(cls):
+        return repr(cls)
+
+    fingerprint = _type_fingerprints.get(cls)
+    if fingerprint is None:
+        if issubclass(cls, Enum):
+            members = [(member.name, repr(member.value)) for member in cls]
+            fingerprint = [_class_path(cls), members]
+        else:
+            module = sys.modules.get(cls.__module__)
+            stamp = _file_stamp(getattr(module, "__file__", None))
+            fingerprint = [_class_path(cls), stamp]
+        _type_fingerprints[cls] = fingerprint
+    return fingerprint
+
+
+def _fingerprint_function(function: Callable) -> Optional[Any]:
+    """The file, position, defaults and annotated types of a function
+
+    Keyed by the modification time of the file instead of the source, as
+    reading the source is slower than building the definition. Returns None
+    for functions without a source file (e.g. defined in an interactive
+    session), which can't be cached.
+    """
+    try:
+        fingerprint = _function_fingerprints.get(function)
+    except TypeError:  # Not weak referenceable
+        return None
+    if fingerprint is not None:
+        return fingerprint
+
+    code = getattr(function, "__code__", None)
+    stamp = _file_stamp(code.co_filename) if code is not None else None
+    if stamp is None:
+        return None
+
+    fingerprint = {
+        "file": stamp,
+        "line": code.co_firstlineno,
+        "module": function.__module__,
+        "qualname": function.__qualname__,
+        "defaults": repr(function.__defaults__),
+        "kwdefaults": repr(function.__kwdefaults__),
+        "annotations": {
+            key: _fingerprint_type(annotation)
+            for key, annotation in function.__annotations__.items()
+        },
+    }
+    _function_fingerprints[function] = fingerprint
+    return fingerprint
+
+
+def _iterate_annotated_classes(annotation: Any) -> Iterator[type]:
+    if inspect.isclass(annotation):
+        yield annotation
+    for arg in get_args(annotation):
+        yield from _iterate_annotated_classes(arg)
+
+
+def _annotated_classes(function: Callable) -> Dict[str, type]:
+    """The classes in the annotations of the function (by their path)"""
+    try:
+        hints = get_type_hints(function, include_extras=True)
+    except Exception:
+        return {}
+    return {
+        _class_path(cls): cls
+        for hint in hints.values()
+        for cls in _iterate_annotated_classes(hint)
+    }
+
+
+class DefinitionCache:
+    """A disk-backed cache of the definitions that prepare_definition generated
+
+    Definitions are pickled to one file per key in a directory. The key is
+    cheap to compute (cheaper than building the definition): it hashes the
+    file (modification time) and position of the function, its default values,
+    its annotated types (their file, or their members for enums), the
+    parameters of prepare_definition and the rekuest version. Fingerprints of
+    functions and types are memoized.
+
+    The classes of the structures of a definition are stored along with it. On
+    a hit, structures that are not registered yet are registered (as defining
+    the function again would), and a definition whose structures are now
+    registered differently is treated as a miss.
+
+    Args:
+        path (str): The directory to store the definitions in
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._version = _package_version()
+
+    def key_for(self, function: Callable, params: Dict[str, Any]) -> Optional[str]:
+        """The cache key for a function (None if it can't be cached)"""
+        fingerprint = _fingerprint_function(function)
+        if fingerprint is None:
+            return None
+
+        try:
+            serialized = json.dumps(
+                [self._version, fingerprint, params],
+                sort_keys=True,
+                default=pydantic_encoder,
+            )
+        except TypeError:
+            return None
+
+        return hashlib.sha256(serialized.encode()).hexdigest()
+
+    def _file_for(self, key: str) -> str:
+        return os.path.join(self.path, f"{key}.pickle")
+
+    def _check_structures(
+        self,
+        definition: DefinitionInput,
+        structures: Dict[str, str],
+        structure_registry: StructureRegistry,
+        function: Optional[Callable],
+    ) -> bool:
+        classes = None
+        for port in _iterate_structure_ports(
+            list(definition.args) + list(definition.returns)
+        ):
+            path = structures.get(port.identifier)
+            if port.identifier not in structure_registry.identifier_structure_map:
+                if classes is None:
+                    classes = _annotated_classes(function) if function else {}
+                if path not in classes:
+                    return False
+                try:
+                    structure_registry.get_fullfilled_structure_for_cls(classes[path])
+                except StructureRegistryError:
+                    return False
+
+            cls = structure_registry.identifier_structure_map.get(port.identifier)
+            if cls is None or _class_path(cls) != path:
+                return False
+            if structure_registry.identifier_scope_map[port.identifier] != port.scope:
+                return False
+
+        return True
+
+    def get(
+        self,
+        key: str,
+        structure_registry: StructureRegistry,
+        function: Optional[Callable] = None,
+    ) -> Optional[DefinitionInput]:
+        """Returns the cached definition, or None on a miss
+
+        Structures that are not registered yet are registered, if they are
+        annotated classes of the function (as defining it would).
+        """
+        try:
+            with open(self._file_for(key), "rb") as f:
+                definition, structures = pickle.load(f)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except Exception:
+            logger.warning(f"Ignoring corrupt cached definition {key}", exc_info=True)
+            self.misses += 1
+            return None
+
+        if not self._check_structures(
+            definition, structures, structure_registry, function
+        ):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return definition
+
+    def put(
+        self,
+        key: str,
+        definition: DefinitionInput,
+        structure_registry: StructureRegistry,
+    ) -> None:
+        structures = {
+            port.identifier: _class_path(
+                structure_registry.identifier_structure_map[port.identifier]
+            )
+            for port in _iterate_structure_ports(
+                list(definition.args) + list(definition.returns)
+            )
+            if port.identifier in structure_registry.identifier_structure_map
+        }
+
+        os.makedirs(self.path, exist_ok=True)
+        # Writing to a temporary file first, so concurrent readers never see a partial file
+        fd, tmp = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                # Pickled, as unpickling skips the (slow) validation of the definition
+                pickle.dump((definition, structures), f)
+            os.replace(tmp, self._file_for(key))
+        except Exception:
+            logger.warning(f"Could not cache definition {key}", exc_info=True)
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def clear(self) -> None:
+        if not os.path.isdir(self.path):
+            return
+        for name in os.listdir(self.path):
+            if name.endswith(".pickle"):
+                os.remove(os.path.join(self.path, name))
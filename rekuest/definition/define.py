@@ -20,6 +20,7 @@ from rekuest.api.schema import (
 import inspect
 from docstring_parser import parse
 from rekuest.definition.errors import DefinitionError, NonSufficientDocumentation
+from rekuest.definition.cache import DefinitionCache, get_default_definition_cache
 import datetime as dt
 from rekuest.structures.registry import (
     StructureRegistry,
@@ -458,6 +459,7 @@ def prepare_definition(
     omitlast=None,
     omitkeys=[],
     allow_annotations: bool = True,
+    definition_cache: Optional[DefinitionCache] = None,
     **kwargs,  # additional kwargs can be ignored
 ) -> DefinitionInput:
     """Define
@@ -472,12 +474,46 @@ def prepare_definition(
     and raise an error if the definition is not compatible with your arkitekt version)
 
 
+    Definitions are cached on disk if a definition cache is passed (or enabled
+    through the REKUEST_DEFINITION_CACHE environment variable), so unchanged
+    functions skip the definition building on the next start.
+
     Args:
         function (): The function you want to define
     """
 
     assert structure_registry is not None, "You need to pass a StructureRegistry"
 
+    definition_cache = definition_cache or get_default_definition_cache()
+    cache_key = None
+    if definition_cache is not None:
+        cache_key = definition_cache.key_for(
+            function,
+            dict(
+                widgets=widgets,
+                return_widgets=return_widgets,
+                groups=groups,
+                effects=effects,
+                port_groups=port_groups,
+                allow_empty_doc=allow_empty_doc,
+                collections=collections,
+                interfaces=interfaces,
+                description=description,
+                is_test_for=is_test_for,
+                port_label_map=port_label_map,
+                port_description_map=port_description_map,
+                name=name,
+                omitfirst=omitfirst,
+                omitlast=omitlast,
+                omitkeys=omitkeys,
+                allow_annotations=allow_annotations,
+            ),
+        )
+        if cache_key is not None:
+            cached = definition_cache.get(cache_key, structure_registry, function)
+            if cached is not None:
+                return cached
+
     is_generator = inspect.isasyncgenfunction(function) or inspect.isgeneratorfunction(
         function
     )
@@ -704,4 +740,7 @@ def prepare_definition(
         }
     )
 
+    if cache_key is not None:
+        definition_cache.put(cache_key, x, structure_registry)
+
     return x
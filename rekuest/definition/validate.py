@@ -1,8 +1,18 @@
+from collections import OrderedDict
+from typing import Tuple
 from rekuest.api.schema import DefinitionInput, DefinitionFragment
 import json
 import hashlib
 
 
+VALIDATION_CACHE_SIZE = 512
+""" The maximum number of validated definitions that are kept per process"""
+
+_validation_cache: "OrderedDict[int, Tuple[DefinitionInput, DefinitionFragment]]" = (
+    OrderedDict()
+)
+
+
 def auto_validate(defintion: DefinitionInput) -> DefinitionFragment:
     """Validates a definition against its own schema
 
@@ -13,9 +23,30 @@ def auto_validate(defintion: DefinitionInput) -> DefinitionFragment:
     context, but the arkitekt service might not be able to adress your actor
     or assign to it.)
 
+    Validated definitions are memoized (by identity of the definition), so
+    validating the same definition again is a lookup. Definitions are frozen,
+    so the returned fragment can be safely shared.
+
     """
+    key = id(defintion)
+    cached = _validation_cache.get(key)
+    # The cache holds a reference to the definition, so its id can't be reused
+    if cached is not None and cached[0] is defintion:
+        _validation_cache.move_to_end(key)
+        return cached[1]
+
+    fragment = DefinitionFragment(**defintion.dict(by_alias=True))
+
+    _validation_cache[key] = (defintion, fragment)
+    if len(_validation_cache) > VALIDATION_CACHE_SIZE:
+        _validation_cache.popitem(last=False)
+
+    return fragment
+
 
-    return DefinitionFragment(**defintion.dict(by_alias=True))
+def clear_validation_cache():
+    """Clears the memoized validations of auto_validate"""
+    _validation_cache.clear()
 
 
 def hash_definition(definition: DefinitionInput):
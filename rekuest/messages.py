@@ -1,4 +1,4 @@
-from typing import Any, List, Optional, TypeVar
+from typing import Any, Dict, List, Optional, Tuple, Type, TypeVar
 from pydantic import BaseModel
 from rekuest.api.schema import (
     LogLevelInput,
@@ -10,6 +10,18 @@ from rekuest.api.schema import (
 T = TypeVar("T", bound=BaseModel)
 
 
+def summarize_args(repr_args: List[Tuple[str, Any]]) -> List[Tuple[str, Any]]:
+    """Replaces the args in the repr of a message with their count
+
+    Messages are logged a lot, and printing (possibly huge) args every time
+    is both slow and unreadable.
+    """
+    return [
+        (key, f"<{len(value)} args>" if key == "args" and value is not None else value)
+        for key, value in repr_args
+    ]
+
+
 class UpdatableModel(BaseModel):
     pass
 
@@ -44,6 +56,26 @@ class Assignation(UpdatableModel):
     status: Optional[AssignationStatus]
     message: Optional[str]
     user: Optional[str]
+    priority: Optional[int]
+
+    @classmethod
+    def parse_lazy(cls: Type[T], data: Dict[str, Any]) -> T:
+        """Parses the message, but keeps the args as they were decoded
+
+        Only the envelope of the message is validated. The args (which can be
+        large) are neither validated nor copied, they are expanded once by the
+        actor that runs the assignation.
+        """
+        args = data.get("args")
+        if args is not None and not isinstance(args, list):
+            return cls(**data)  # Raises the validation error
+
+        message = cls(**{key: value for key, value in data.items() if key != "args"})
+        message.args = args
+        return message
+
+    def __repr_args__(self):
+        return summarize_args(super().__repr_args__())
 
 
 class Unassignation(UpdatableModel):
@@ -1,5 +1,4 @@
 import asyncio
-import json
 
 import websockets
 from rekuest.api.schema import AssignationStatus, ReservationStatus, ReserveParamsInput
@@ -15,7 +14,14 @@ from rekuest.postmans.transport.errors import (
     UnassignDeniedError,
     UnreserveDeniedError,
 )
-from pydantic import Field
+from pydantic import Field, PrivateAttr
+from rekuest.compression import (
+    Compressor,
+    compress_frame,
+    decompress_frame,
+    get_compressor,
+)
+from rekuest.codecs import Codec, Frame, get_codec, get_default_codec, negotiate_codec
 from rekuest.postmans.transport.protocols.postman_json import (
     JSONMessage,
     AssignList,
@@ -63,12 +69,22 @@ class WebsocketPostmanTransport(PostmanTransport):
     allow_reconnect = True
 
     auto_connect = True
+    codec: Optional[str] = None
+    """ The codec to encode messages with (see rekuest.codecs), defaults to json"""
+    compression: Optional[str] = None
+    """ Compress frames above compression_threshold with this method (deflate or zstd). The server needs to support it"""
+    compression_threshold: int = 16 * 1024
+    """ Frames up to this size (in bytes) are sent uncompressed"""
+    permessage_deflate: Optional[bool] = None
+    """ Negotiate permessage-deflate, which compresses every message (defaults to True, unless compression is set)"""
 
     _futures: Dict[str, asyncio.Future] = {}
     _connected = False
     _healthy = False
     _send_queue: Optional[asyncio.Queue] = None
     _connection_task: Optional[asyncio.Task] = None
+    _codec: Codec = PrivateAttr(default_factory=get_default_codec)
+    _compressor: Optional[Compressor] = None
 
     async def aconnect(self):
         assert self._abroadcast is not None, (
@@ -77,6 +93,9 @@ class WebsocketPostmanTransport(PostmanTransport):
         )
 
         assert self.instance_id, "Needs an instance id"
+        self._codec = get_codec(self.codec)
+        if self.compression is not None:
+            self._compressor = get_compressor(self.compression)
         self._send_queue = asyncio.Queue()
         self._connection_task = asyncio.create_task(self.websocket_loop())
         self._connected = True
@@ -87,10 +106,14 @@ class WebsocketPostmanTransport(PostmanTransport):
         try:
             try:
                 token = await self.token_loader(force_refresh=reload_token)
+                codec = get_codec(self.codec)
 
                 async with websockets.connect(
-                    f"{self.endpoint_url}?token={token}&instance_id={self.instance_id}"
+                    f"{self.endpoint_url}?token={token}&instance_id={self.instance_id}",
+                    subprotocols=[codec.subprotocol] if codec.subprotocol else None,
+                    compression="deflate" if self.uses_permessage_deflate() else None,
                 ) as client:
+                    self._codec = negotiate_codec(codec, client.subprotocol)
                     logger.info("Postman on Websockets connected")
 
                     send_task = asyncio.create_task(self.sending(client))
@@ -148,12 +171,48 @@ class WebsocketPostmanTransport(PostmanTransport):
             await asyncio.gather(send_task, receive_task, return_exceptions=True)
             raise e
 
+    def queue_depths(self) -> Dict[str, int]:
+        """The number of messages waiting to be sent"""
+        return {
+            "send_queue": self._send_queue.qsize()
+            if self._send_queue is not None
+            else 0
+        }
+
+    def uses_permessage_deflate(self) -> bool:
+        if self.permessage_deflate is not None:
+            return self.permessage_deflate
+        return self.compression is None
+
+    def encode(self, message: JSONMessage) -> Optional[Frame]:
+        """Encodes (and compresses) a message (returns None if it can't be encoded)
+
+        An action that can't be encoded fails its awaitaction call, instead of
+        killing the send task and dropping the connection.
+        """
+        try:
+            frame = self._codec.encode(message)
+        except Exception as e:
+            logger.error(f"Could not encode message {message.id}", exc_info=True)
+            future = self._futures.get(message.id)
+            if future is not None and not future.done():
+                future.set_exception(e)
+            return None
+
+        if self._compressor is not None:
+            frame = compress_frame(frame, self._compressor, self.compression_threshold)
+        return frame
+
     async def sending(self, client):
         try:
             while True:
                 message = await self._send_queue.get()
-                await client.send(message)
-                self._send_queue.task_done()
+                try:
+                    frame = self.encode(message)
+                    if frame is not None:
+                        await client.send(frame)
+                finally:
+                    self._send_queue.task_done()
         except asyncio.CancelledError:
             logger.info("Sending Task sucessfully Cancelled")
 
@@ -165,7 +224,7 @@ class WebsocketPostmanTransport(PostmanTransport):
             logger.info("Receiving Task sucessfully Cancelled")
 
     async def receive(self, message):
-        json_dict = json.loads(message)
+        json_dict = self._codec.loads(decompress_frame(message))
         if "type" in json_dict:
             type = json_dict["type"]
             id = json_dict["id"]
@@ -229,7 +288,7 @@ class WebsocketPostmanTransport(PostmanTransport):
 
         future = asyncio.Future()
         self._futures[action.id] = future
-        await self._send_queue.put(action.json())
+        await self._send_queue.put(action)
         return await future
 
     async def alist_reservations(
@@ -227,6 +227,11 @@ def register_structure(
     convert_default: Callable[[Any], str] = None,
     default_widget: WidgetInput = None,
     default_returnwidget: ReturnWidgetInput = None,
+    abatch_expand: Callable[[List[str]], Awaitable[List[Any]]] = None,
+    abatch_shrink: Callable[[List[Any]], Awaitable[List[str]]] = None,
+    immutable: bool = False,
+    expansion_cache_size: int = 256,
+    expansion_cache_ttl: Optional[float] = None,
     registry: StructureRegistry = None,
     **kwargs,
 ):
@@ -235,6 +240,11 @@ def register_structure(
     Args:
         cls (Structure): The structure class
         name (str, optional): The name of the structure. Defaults to the class name.
+        abatch_expand (Callable, optional): Expands a list of ids in one call. Used for lists of this structure.
+        abatch_shrink (Callable, optional): Shrinks a list of values in one call. Used for lists of this structure.
+        immutable (bool, optional): The structure never changes on the server, so expansions can be cached. Defaults to False.
+        expansion_cache_size (int, optional): Maximum number of cached expansions (if immutable). Defaults to 256.
+        expansion_cache_ttl (float, optional): Seconds a cached expansion stays valid (if immutable). Defaults to None (no expiry).
     """
     if len(cls) > 1:
         raise ValueError("You can only register one function or actor at a time.")
@@ -253,6 +263,11 @@ def register_structure(
             convert_default=convert_default,
             default_widget=default_widget,
             default_returnwidget=default_returnwidget,
+            abatch_expand=abatch_expand,
+            abatch_shrink=abatch_shrink,
+            immutable=immutable,
+            expansion_cache_size=expansion_cache_size,
+            expansion_cache_ttl=expansion_cache_ttl,
             **kwargs,
         )
 
@@ -275,6 +290,11 @@ def register_structure(
                 convert_default=convert_default,
                 default_widget=default_widget,
                 default_returnwidget=default_returnwidget,
+                abatch_expand=abatch_expand,
+                abatch_shrink=abatch_shrink,
+                immutable=immutable,
+                expansion_cache_size=expansion_cache_size,
+                expansion_cache_ttl=expansion_cache_ttl,
                 **kwargs,
             )
 
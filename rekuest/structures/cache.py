@@ -0,0 +1,95 @@
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+import time
+from .errors import StructureExpandingError
+
+
+class ExpansionCache:
+    """A size and TTL bounded cache of expanded structures
+
+    Maps the (shrunk) id of a structure to its expanded value. Only use
+    this for structures that are immutable on the server, as a cached
+    value will never be refreshed before it expires.
+
+    Args:
+        maxsize (int, optional): The maximum number of cached values. Defaults to 256.
+        ttl (float, optional): Seconds a value stays valid. Defaults to None (no expiry).
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: Optional[float] = None) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._store: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, id: Any) -> Tuple[bool, Any]:
+        """Returns (True, value) on a hit and (False, None) on a miss"""
+        key = str(id)
+        entry = self._store.get(key)
+        if entry is not None:
+            expires, value = entry
+            if self.ttl is None or time.monotonic() < expires:
+                self._store.move_to_end(key)
+                self.hits += 1
+                return True, value
+            del self._store[key]
+
+        self.misses += 1
+        return False, None
+
+    def put(self, id: Any, value: Any) -> None:
+        key = str(id)
+        expires = time.monotonic() + self.ttl if self.ttl is not None else 0
+        self._store[key] = (expires, value)
+        self._store.move_to_end(key)
+        while len(self._store) > self.maxsize:
+            self._store.popitem(last=False)
+
+    def invalidate(self, id: Any) -> None:
+        self._store.pop(str(id), None)
+
+    def clear(self) -> None:
+        self._store.clear()
+
+    def __len__(self) -> int:
+        return len(self._store)
+
+    async def aexpand(self, expander: Callable[[str], Awaitable[Any]], id: Any) -> Any:
+        """Expands through the cache, only calling the expander on a miss"""
+        hit, value = self.get(id)
+        if hit:
+            return value
+
+        value = await expander(id)
+        self.put(id, value)
+        return value
+
+    async def abatch_expand(
+        self,
+        batch_expander: Callable[[List[str]], Awaitable[List[Any]]],
+        ids: List[Any],
+    ) -> List[Any]:
+        """Batch expands through the cache, only passing the missed ids"""
+        values = []
+        missing = []
+        for id in ids:
+            hit, value = self.get(id)
+            values.append(value)
+            if not hit:
+                missing.append(id)
+
+        if not missing:
+            return values
+
+        expanded = await batch_expander(missing)
+        if len(expanded) != len(missing):
+            raise StructureExpandingError(
+                f"Batch expander returned {len(expanded)} values for {len(missing)} ids"
+            )
+
+        fetched = dict(zip(map(str, missing), expanded))
+        for id, value in fetched.items():
+            self.put(id, value)
+
+        return [fetched.get(str(id), value) for id, value in zip(ids, values)]
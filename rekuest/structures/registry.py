@@ -38,6 +38,8 @@ from .types import PortBuilder, FullFilledStructure
 from .hooks.types import RegistryHook
 from .hooks.default import get_default_hooks
 from .hooks.errors import HookError
+from .cache import ExpansionCache
+from functools import partial
 
 current_structure_registry = contextvars.ContextVar("current_structure_registry")
 
@@ -71,6 +73,13 @@ class StructureRegistry(BaseModel):
     _identifier_collecter_map: Dict[str, Callable[[Any], Awaitable[None]]] = {}
     _identifier_predicate_map: Dict[str, Callable[[Any], bool]] = {}
     _identifier_builder_map: Dict[str, PortBuilder] = {}
+    _identifier_batch_expander_map: Dict[
+        str, Callable[[List[str]], Awaitable[List[Any]]]
+    ] = {}
+    _identifier_batch_shrinker_map: Dict[
+        str, Callable[[List[Any]], Awaitable[List[str]]]
+    ] = {}
+    _identifier_expansion_cache_map: Dict[str, ExpansionCache] = {}
 
     _structure_convert_default_map: Dict[str, Callable[[Any], str]] = {}
     _structure_identifier_map: Dict[Type, str] = {}
@@ -87,10 +96,15 @@ class StructureRegistry(BaseModel):
 
     def get_expander_for_identifier(self, key):
         try:
-            return self._identifier_expander_map[key]
+            expander = self._identifier_expander_map[key]
         except KeyError as e:
             raise StructureRegistryError(f"Expander for {key} is not registered") from e
 
+        cache = self._identifier_expansion_cache_map.get(key, None)
+        if cache is not None:
+            return partial(cache.aexpand, expander)
+        return expander
+
     def get_collector_for_identifier(self, key):
         try:
             return self._identifier_collecter_map[key]
@@ -108,6 +122,63 @@ class StructureRegistry(BaseModel):
     def register_expander(self, key, expander):
         self._identifier_expander_map[key] = expander
 
+    def get_batch_expander_for_identifier(
+        self, key
+    ) -> Optional[Callable[[List[str]], Awaitable[List[Any]]]]:
+        batch_expander = self._identifier_batch_expander_map.get(key, None)
+
+        cache = self._identifier_expansion_cache_map.get(key, None)
+        if cache is not None and batch_expander is not None:
+            return partial(cache.abatch_expand, batch_expander)
+        return batch_expander
+
+    def get_batch_shrinker_for_identifier(
+        self, key
+    ) -> Optional[Callable[[List[Any]], Awaitable[List[str]]]]:
+        return self._identifier_batch_shrinker_map.get(key, None)
+
+    def register_batch_expander(
+        self, key, batch_expander: Callable[[List[str]], Awaitable[List[Any]]]
+    ):
+        """Registers a batch expander for a structure
+
+        A batch expander expands a list of ids in one call (e.g. one
+        request instead of one per id) and returns the expanded values in
+        the same order. Lists of this structure will then be expanded
+        through the batch expander instead of calling the expander per item.
+        """
+        self._identifier_batch_expander_map[key] = batch_expander
+
+    def register_batch_shrinker(
+        self, key, batch_shrinker: Callable[[List[Any]], Awaitable[List[str]]]
+    ):
+        """Registers a batch shrinker for a structure
+
+        Counterpart to `register_batch_expander`. Shrinks a list of values
+        in one call and returns their ids in the same order.
+        """
+        self._identifier_batch_shrinker_map[key] = batch_shrinker
+
+    def register_expansion_cache(
+        self, key, maxsize: int = 256, ttl: Optional[float] = None
+    ) -> ExpansionCache:
+        """Caches the expansions of a structure
+
+        Expanded values are cached by their id (bounded by maxsize and ttl),
+        so that repeated assignments with the same ids don't need to call the
+        expander again. Only use this for immutable structures.
+        """
+        cache = ExpansionCache(maxsize=maxsize, ttl=ttl)
+        self._identifier_expansion_cache_map[key] = cache
+        return cache
+
+    def get_expansion_cache_for_identifier(self, key) -> Optional[ExpansionCache]:
+        return self._identifier_expansion_cache_map.get(key, None)
+
+    def clear_expansion_caches(self):
+        for cache in self._identifier_expansion_cache_map.values():
+            cache.clear()
+
     def get_widget_input(self, cls) -> Optional[WidgetInput]:
         return self._structure_default_widget_map.get(cls, None)
 
@@ -190,6 +261,11 @@ class StructureRegistry(BaseModel):
         convert_default: Callable[[Any], str] = None,
         default_widget: Optional[WidgetInput] = None,
         default_returnwidget: Optional[ReturnWidgetInput] = None,
+        abatch_expand: Callable[[List[str]], Awaitable[List[Any]]] = None,
+        abatch_shrink: Callable[[List[Any]], Awaitable[List[str]]] = None,
+        immutable: bool = False,
+        expansion_cache_size: int = 256,
+        expansion_cache_ttl: Optional[float] = None,
     ):
         fullfilled_structure = None
         for key, hook in self.registry_hooks.items():
@@ -225,6 +301,17 @@ class StructureRegistry(BaseModel):
 
         self.fullfill_registration(fullfilled_structure)
 
+        if abatch_expand is not None:
+            self.register_batch_expander(fullfilled_structure.identifier, abatch_expand)
+        if abatch_shrink is not None:
+            self.register_batch_shrinker(fullfilled_structure.identifier, abatch_shrink)
+        if immutable:
+            self.register_expansion_cache(
+                fullfilled_structure.identifier,
+                maxsize=expansion_cache_size,
+                ttl=expansion_cache_ttl,
+            )
+
     def get_fullfilled_structure_for_cls(self, cls: Type) -> FullFilledStructure:
         try:
             return self._fullfilled_structures_map[cls]
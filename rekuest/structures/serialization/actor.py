@@ -18,6 +18,9 @@ from rekuest.structures.errors import (
 )
 from rekuest.definition.validate import auto_validate
 from .predication import predicate_port
+from .compiled import reaches_structure, compile_sync_expander, compile_sync_shrinker
+from .vectorized import is_scalar_list, build_list_converter
+from .batch import get_batch_expander, get_batch_shrinker, abatch_expand, abatch_shrink
 import datetime as dt
 
 
@@ -84,6 +87,18 @@ async def aexpand_arg(
                 " accept lists"
             ) from None
 
+        if is_scalar_list(port):
+            return build_list_converter(port)(value)
+
+        if not reaches_structure(port.child):
+            # No structure in the items, so there is nothing to await
+            expand = compile_sync_expander(port.child, structure_registry)
+            return [expand(item) for item in value]
+
+        batch_expander = get_batch_expander(port, structure_registry)
+        if batch_expander is not None:
+            return await abatch_expand(port, value, batch_expander)
+
         return await asyncio.gather(
             *[aexpand_arg(port.child, item, structure_registry) for item in value]
         )
@@ -209,6 +224,19 @@ async def ashrink_return(
             }
 
         if port.kind == PortKind.LIST:
+            if is_scalar_list(port):
+                # Also accepts array.array and numpy arrays
+                return build_list_converter(port)(value)
+
+            if not reaches_structure(port.child):
+                # No structure in the items, so there is nothing to await
+                shrink = compile_sync_shrinker(port.child, structure_registry)
+                return [shrink(item) for item in value]
+
+            batch_shrinker = get_batch_shrinker(port, structure_registry)
+            if batch_shrinker is not None:
+                return await abatch_shrink(port, value, batch_shrinker)
+
             return await asyncio.gather(
                 *[
                     ashrink_return(
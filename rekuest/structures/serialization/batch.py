@@ -0,0 +1,113 @@
+from typing import Any, Awaitable, Callable, List, Optional, Union
+from rekuest.api.schema import PortFragment, PortKind, ChildPortFragment
+from rekuest.structures.registry import StructureRegistry
+from rekuest.structures.errors import (
+    PortExpandingError,
+    PortShrinkingError,
+    StructureExpandingError,
+    StructureShrinkingError,
+)
+
+
+def get_batch_expander(
+    port: Union[PortFragment, ChildPortFragment],
+    structure_registry: StructureRegistry,
+) -> Optional[Callable[[List[str]], Awaitable[List[Any]]]]:
+    """Returns the batch expander for a list of structures (if registered)"""
+    child = getattr(port, "child", None)
+    if (
+        structure_registry is None
+        or port.kind != PortKind.LIST
+        or child is None
+        or child.kind != PortKind.STRUCTURE
+    ):
+        return None
+    return structure_registry.get_batch_expander_for_identifier(child.identifier)
+
+
+def get_batch_shrinker(
+    port: Union[PortFragment, ChildPortFragment],
+    structure_registry: StructureRegistry,
+) -> Optional[Callable[[List[Any]], Awaitable[List[str]]]]:
+    """Returns the batch shrinker for a list of structures (if registered)"""
+    child = getattr(port, "child", None)
+    if (
+        structure_registry is None
+        or port.kind != PortKind.LIST
+        or child is None
+        or child.kind != PortKind.STRUCTURE
+    ):
+        return None
+    return structure_registry.get_batch_shrinker_for_identifier(child.identifier)
+
+
+async def abatch_expand(
+    port: Union[PortFragment, ChildPortFragment],
+    value: List[Any],
+    batch_expander: Callable[[List[str]], Awaitable[List[Any]]],
+) -> List[Any]:
+    """Expands a list of structures with one call to the batch expander
+
+    Null items are kept in place (if the child port is nullable) and are
+    not passed to the batch expander.
+    """
+    ids = [item for item in value if item is not None]
+    if len(ids) != len(value) and not port.child.nullable:
+        raise PortExpandingError(
+            f"{port.child.identifier} is not nullable (optional) but received None"
+        )
+
+    for item in ids:
+        if not isinstance(item, (str, int)):
+            raise PortExpandingError(
+                f"Expected value to be a string or int, but got {type(item)}"
+            )
+
+    try:
+        expanded = await batch_expander(ids)
+    except Exception as e:
+        raise StructureExpandingError(
+            f"Error batch expanding {repr(ids)} with Structure {port.child.identifier}"
+        ) from e
+
+    if len(expanded) != len(ids):
+        raise StructureExpandingError(
+            f"Batch expander for {port.child.identifier} returned {len(expanded)} values"
+            f" for {len(ids)} ids"
+        )
+
+    expanded_iterator = iter(expanded)
+    return [None if item is None else next(expanded_iterator) for item in value]
+
+
+async def abatch_shrink(
+    port: Union[PortFragment, ChildPortFragment],
+    value: List[Any],
+    batch_shrinker: Callable[[List[Any]], Awaitable[List[str]]],
+) -> List[Optional[str]]:
+    """Shrinks a list of structures with one call to the batch shrinker
+
+    Null items are kept in place (if the child port is nullable) and are
+    not passed to the batch shrinker.
+    """
+    items = [item for item in value if item is not None]
+    if len(items) != len(value) and not port.child.nullable:
+        raise PortShrinkingError(
+            f"{port.child.identifier} is not nullable (optional) but your provided None"
+        )
+
+    try:
+        shrunk = await batch_shrinker(items)
+    except Exception as e:
+        raise StructureShrinkingError(
+            f"Error batch shrinking {repr(items)} with Structure {port.child.identifier}"
+        ) from e
+
+    if len(shrunk) != len(items):
+        raise StructureShrinkingError(
+            f"Batch shrinker for {port.child.identifier} returned {len(shrunk)} ids"
+            f" for {len(items)} values"
+        )
+
+    shrunk_iterator = iter(shrunk)
+    return [None if item is None else str(next(shrunk_iterator)) for item in value]
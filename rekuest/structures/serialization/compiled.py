@@ -0,0 +1,522 @@
+from typing import Any, Awaitable, Callable, List, Tuple, Union
+import asyncio
+import datetime as dt
+from pydantic import BaseModel
+from rekuest.api.schema import (
+    PortFragment,
+    PortKind,
+    ChildPortFragment,
+    DefinitionInput,
+    DefinitionFragment,
+)
+from rekuest.structures.registry import StructureRegistry
+from rekuest.structures.errors import (
+    ExpandingError,
+    ShrinkingError,
+    PortShrinkingError,
+    StructureShrinkingError,
+    StructureExpandingError,
+    StructureRegistryError,
+)
+from rekuest.definition.validate import auto_validate
+from .predication import predicate_port
+from .vectorized import is_scalar_list, build_list_converter
+from .batch import get_batch_expander, get_batch_shrinker, abatch_expand, abatch_shrink
+
+
+Expander = Callable[[Any], Awaitable[Any]]
+""" A compiled converter that expands a serialized value through a port"""
+Shrinker = Callable[[Any], Awaitable[Any]]
+""" A compiled converter that shrinks a python value through a port"""
+Converter = Callable[[Any], Any]
+""" A compiled converter that is either sync or async (see `is_async`)"""
+
+
+def reaches_structure(port: Union[PortFragment, ChildPortFragment]) -> bool:
+    """Checks if a structure port is reachable from this port
+
+    Only subtrees that reach a structure need to be awaited, everything
+    else can be converted synchronously.
+    """
+    if port.kind == PortKind.STRUCTURE:
+        return True
+
+    child = getattr(port, "child", None)
+    if child is not None and reaches_structure(child):
+        return True
+
+    variants = getattr(port, "variants", None) or []
+    return any(reaches_structure(variant) for variant in variants)
+
+
+def _as_async(converter: Converter) -> Callable[[Any], Awaitable[Any]]:
+    async def async_converter(value):
+        return converter(value)
+
+    return async_converter
+
+
+def _compile_expand(
+    port: Union[PortFragment, ChildPortFragment],
+    structure_registry: StructureRegistry,
+) -> Tuple[Converter, bool]:
+    """Compiles a port into a converter and whether it needs to be awaited"""
+    kind = port.kind
+    default = getattr(port, "default", None)
+    nullable = port.nullable
+    key = getattr(port, "key", None)
+
+    if kind == PortKind.DICT:
+        child, is_async = _compile_expand(port.child, structure_registry)
+
+        def check(value):
+            if not isinstance(value, dict):
+                raise ExpandingError(
+                    f"Can't expand {value} of type {type(value)} to {kind}. We only"
+                    " accept dicts"
+                ) from None
+
+        if is_async:
+
+            async def convert(value):
+                check(value)
+                return {key: await child(item) for key, item in value.items()}
+
+        else:
+
+            def convert(value):
+                check(value)
+                return {key: child(item) for key, item in value.items()}
+
+    elif kind == PortKind.UNION:
+        compiled = [_compile_expand(x, structure_registry) for x in port.variants]
+        is_async = any(variant_async for _, variant_async in compiled)
+
+        def check(value):
+            if not isinstance(value, dict):
+                raise ExpandingError(
+                    f"Can't expand {value} of type {type(value)} to {kind}. We only"
+                    " accept dicts in unions"
+                )
+            assert "use" in value, "No use in vaalue"
+
+        if is_async:
+            variants = [
+                variant if variant_async else _as_async(variant)
+                for variant, variant_async in compiled
+            ]
+
+            async def convert(value):
+                check(value)
+                return await variants[value["use"]](value["value"])
+
+        else:
+            variants = [variant for variant, _ in compiled]
+
+            def convert(value):
+                check(value)
+                return variants[value["use"]](value["value"])
+
+    elif kind == PortKind.LIST:
+        child, is_async = _compile_expand(port.child, structure_registry)
+
+        def check(value):
+            if not isinstance(value, list):
+                raise ExpandingError(
+                    f"Can't expand {value} of type {type(value)} to {kind}. Only"
+                    " accept lists"
+                ) from None
+
+        if is_scalar_list(port):
+            bulk = build_list_converter(port)
+
+            def convert(value):
+                check(value)
+                return bulk(value)
+
+        elif is_async:
+
+            async def convert(value):
+                check(value)
+                batch_expander = get_batch_expander(port, structure_registry)
+                if batch_expander is not None:
+                    return await abatch_expand(port, value, batch_expander)
+                return await asyncio.gather(*[child(item) for item in value])
+
+        else:
+
+            def convert(value):
+                check(value)
+                return [child(item) for item in value]
+
+    elif kind == PortKind.INT:
+        convert, is_async = int, False
+
+    elif kind == PortKind.DATE:
+        is_async = False
+
+        def convert(value):
+            return dt.datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+    elif kind == PortKind.FLOAT:
+        convert, is_async = float, False
+
+    elif kind == PortKind.BOOL:
+        convert, is_async = bool, False
+
+    elif kind == PortKind.STRING:
+        convert, is_async = str, False
+
+    elif kind == PortKind.STRUCTURE:
+        identifier = port.identifier
+        is_async = True
+
+        async def convert(value):
+            try:
+                expander = structure_registry.get_expander_for_identifier(identifier)
+            except (KeyError, StructureRegistryError):
+                raise StructureExpandingError(
+                    f"Couldn't find expander for {identifier}"
+                ) from None
+
+            try:
+                return await expander(value)
+            except Exception as e:
+                raise StructureExpandingError(
+                    f"Error expanding {repr(value)} with Structure {identifier}"
+                ) from e
+
+    else:
+        raise NotImplementedError(f"Cannot compile expander for {kind}")
+
+    def check_value(value):
+        if value is None:
+            value = default
+
+        if value is None:
+            if nullable:
+                return None
+            raise ExpandingError(f"{key} is not nullable (optional) but received None")
+
+        if not isinstance(value, (str, int, float, dict, list)):
+            raise ExpandingError(
+                f"Can't expand {value} of type {type(value)} to {kind}. We only accept"
+                " strings, ints and floats (json serializable) and null values"
+            ) from None
+
+        return value
+
+    if is_async:
+
+        async def expand(value):
+            value = check_value(value)
+            return None if value is None else await convert(value)
+
+    else:
+
+        def expand(value):
+            value = check_value(value)
+            return None if value is None else convert(value)
+
+    return expand, is_async
+
+
+def compile_expander(
+    port: Union[PortFragment, ChildPortFragment],
+    structure_registry: StructureRegistry,
+) -> Expander:
+    """Compiles a port into an expander
+
+    The port tree is walked once and every port is translated into a
+    closure that only does the conversion for its kind. Calling the
+    returned expander is equivalent to calling `aexpand_arg` with the
+    same port, without redoing the kind dispatch on every call.
+
+    Subtrees that don't reach a structure are compiled to plain sync
+    converters, so e.g. a list of floats is converted in a single
+    comprehension instead of one coroutine per item.
+
+    Args:
+        port (Union[PortFragment, ChildPortFragment]): The port to compile
+        structure_registry (StructureRegistry): The registry to retrieve expanders from
+
+    Returns:
+        Expander: The compiled expander
+    """
+    expand, is_async = _compile_expand(port, structure_registry)
+    return expand if is_async else _as_async(expand)
+
+
+def compile_sync_expander(
+    port: Union[PortFragment, ChildPortFragment],
+    structure_registry: StructureRegistry = None,
+) -> Converter:
+    """Compiles a port that doesn't reach a structure into a sync expander"""
+    expand, is_async = _compile_expand(port, structure_registry)
+    assert not is_async, f"{port} reaches a structure and needs to be awaited"
+    return expand
+
+
+def _compile_shrink(
+    port: Union[PortFragment, ChildPortFragment],
+    structure_registry: StructureRegistry,
+) -> Tuple[Converter, bool]:
+    """Compiles a port into a converter and whether it needs to be awaited"""
+    kind = port.kind
+    nullable = port.nullable
+
+    if kind == PortKind.UNION:
+        compiled = [(x, *_compile_shrink(x, structure_registry)) for x in port.variants]
+        is_async = any(variant_async for _, _, variant_async in compiled)
+
+        def raise_no_variant():
+            raise ShrinkingError(
+                f"Port is union butn none of the predicated for this port held true {port.variants}"
+            )
+
+        if is_async:
+            variants = [
+                (x, variant if variant_async else _as_async(variant))
+                for x, variant, variant_async in compiled
+            ]
+
+            async def convert(value):
+                for index, (x, shrinker) in enumerate(variants):
+                    if predicate_port(x, value, structure_registry):
+                        return {"use": index, "value": await shrinker(value)}
+                raise_no_variant()
+
+        else:
+            variants = [(x, variant) for x, variant, _ in compiled]
+
+            def convert(value):
+                for index, (x, shrinker) in enumerate(variants):
+                    if predicate_port(x, value, structure_registry):
+                        return {"use": index, "value": shrinker(value)}
+                raise_no_variant()
+
+    elif kind == PortKind.DICT:
+        child, is_async = _compile_shrink(port.child, structure_registry)
+
+        if is_async:
+
+            async def convert(value):
+                return {key: await child(item) for key, item in value.items()}
+
+        else:
+
+            def convert(value):
+                return {key: child(item) for key, item in value.items()}
+
+    elif kind == PortKind.LIST:
+        child, is_async = _compile_shrink(port.child, structure_registry)
+
+        if is_scalar_list(port):
+            # Also accepts array.array and numpy arrays
+            convert = build_list_converter(port)
+
+        elif is_async:
+
+            async def convert(value):
+                batch_shrinker = get_batch_shrinker(port, structure_registry)
+                if batch_shrinker is not None:
+                    return await abatch_shrink(port, value, batch_shrinker)
+                return await asyncio.gather(*[child(item) for item in value])
+
+        else:
+
+            def convert(value):
+                return [child(item) for item in value]
+
+    elif kind == PortKind.INT:
+        convert, is_async = int, False
+
+    elif kind == PortKind.FLOAT:
+        convert, is_async = float, False
+
+    elif kind == PortKind.DATE:
+        is_async = False
+
+        def convert(value):
+            return value.isoformat()
+
+    elif kind == PortKind.BOOL:
+        convert, is_async = bool, False
+
+    elif kind == PortKind.STRING:
+        convert, is_async = str, False
+
+    elif kind == PortKind.STRUCTURE:
+        identifier = port.identifier
+        is_async = True
+
+        async def convert(value):
+            try:
+                shrinker = structure_registry.get_shrinker_for_identifier(identifier)
+            except (KeyError, StructureRegistryError):
+                raise StructureShrinkingError(
+                    f"Couldn't find shrinker for {identifier}"
+                ) from None
+            try:
+                return str(await shrinker(value))
+            except Exception as e:
+                raise StructureShrinkingError(
+                    f"Error shrinking {repr(value)} with Structure {identifier}"
+                ) from e
+
+    else:
+        raise NotImplementedError(f"Cannot compile shrinker for {kind}")
+
+    def check_none():
+        if not nullable:
+            raise ValueError(
+                f"{port} is not nullable (optional) but your provided None"
+            )
+
+    if is_async:
+
+        async def shrink(value):
+            try:
+                if value is None:
+                    return check_none()
+                return await convert(value)
+            except Exception as e:
+                raise PortShrinkingError(
+                    f"Couldn't shrink value {value} with port {port}"
+                ) from e
+
+    else:
+
+        def shrink(value):
+            try:
+                if value is None:
+                    return check_none()
+                return convert(value)
+            except Exception as e:
+                raise PortShrinkingError(
+                    f"Couldn't shrink value {value} with port {port}"
+                ) from e
+
+    return shrink, is_async
+
+
+def compile_shrinker(
+    port: Union[PortFragment, ChildPortFragment],
+    structure_registry: StructureRegistry,
+) -> Shrinker:
+    """Compiles a port into a shrinker
+
+    Counterpart to `compile_expander`. Calling the returned shrinker is
+    equivalent to calling `ashrink_return` with the same port.
+
+    Args:
+        port (Union[PortFragment, ChildPortFragment]): The port to compile
+        structure_registry (StructureRegistry): The registry to retrieve shrinkers from
+
+    Returns:
+        Shrinker: The compiled shrinker
+    """
+    shrink, is_async = _compile_shrink(port, structure_registry)
+    return shrink if is_async else _as_async(shrink)
+
+
+def compile_sync_shrinker(
+    port: Union[PortFragment, ChildPortFragment],
+    structure_registry: StructureRegistry = None,
+) -> Converter:
+    """Compiles a port that doesn't reach a structure into a sync shrinker"""
+    shrink, is_async = _compile_shrink(port, structure_registry)
+    assert not is_async, f"{port} reaches a structure and needs to be awaited"
+    return shrink
+
+
+class CompiledDefinition(BaseModel):
+    """A definition compiled to converters
+
+    Holds one compiled expander per arg and one compiled shrinker per return
+    of a definition. Build it once (e.g. when an actor is built) through
+    `compile_definition` and reuse it for every assignment.
+    """
+
+    definition: DefinitionFragment
+    arg_keys: List[str]
+    expanders: List[Expander]
+    shrinkers: List[Shrinker]
+
+    async def aexpand_inputs(
+        self,
+        args: List[Union[str, int, float, dict, list]],
+        skip_expanding: bool = False,
+    ):
+        """Expand inputs (see `expand_inputs`)"""
+        if skip_expanding:
+            return {
+                key: arg for key, arg in zip(self.arg_keys, args) if arg is not None
+            }
+
+        try:
+            expanded_args = await asyncio.gather(
+                *[expander(arg) for expander, arg in zip(self.expanders, args)]
+            )
+            return {key: val for key, val in zip(self.arg_keys, expanded_args)}
+        except Exception as e:
+            raise ExpandingError(f"Couldn't expand Arguments {args}") from e
+
+    async def ashrink_outputs(
+        self, returns: Any, skip_shrinking: bool = False
+    ) -> Tuple[Union[str, int, float, dict, list, None]]:
+        """Shrink outputs (see `shrink_outputs`)"""
+        if returns is None:
+            returns = []
+        elif not isinstance(returns, tuple):
+            returns = [returns]
+
+        assert len(self.shrinkers) == len(
+            returns
+        ), f"Mismatch in Return Length: expected {len(self.shrinkers)} got {len(returns)}"
+
+        if skip_shrinking:
+            return tuple(returns)
+
+        try:
+            return tuple(
+                await asyncio.gather(
+                    *[shrinker(val) for shrinker, val in zip(self.shrinkers, returns)]
+                )
+            )
+        except Exception as e:
+            raise ShrinkingError(f"Couldn't shrink Returns {returns}") from e
+
+    class Config:
+        arbitrary_types_allowed = True
+        copy_on_model_validation = "none"
+
+
+def compile_definition(
+    definition: Union[DefinitionInput, DefinitionFragment],
+    structure_registry: StructureRegistry,
+) -> CompiledDefinition:
+    """Compiles a definition
+
+    Validates the definition (if necessary) and compiles all of its
+    args and returns to converters.
+
+    Args:
+        definition (Union[DefinitionInput, DefinitionFragment]): The definition
+        structure_registry (StructureRegistry): The structure registry to use
+
+    Returns:
+        CompiledDefinition: The compiled definition
+    """
+    node = (
+        auto_validate(definition)
+        if isinstance(definition, DefinitionInput)
+        else definition
+    )
+
+    return CompiledDefinition(
+        definition=node,
+        arg_keys=[port.key for port in node.args],
+        expanders=[compile_expander(port, structure_registry) for port in node.args],
+        shrinkers=[compile_shrinker(port, structure_registry) for port in node.returns],
+    )
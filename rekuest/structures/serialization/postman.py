@@ -17,6 +17,8 @@ from rekuest.structures.errors import (
     StructureExpandingError,
 )
 from .predication import predicate_port
+from .vectorized import is_scalar_list, build_list_converter
+from .batch import get_batch_expander, get_batch_shrinker, abatch_expand, abatch_shrink
 import datetime as dt
 
 
@@ -48,6 +50,14 @@ async def ashrink_arg(
             }
 
         if port.kind == PortKind.LIST:
+            if is_scalar_list(port):
+                # Also accepts array.array and numpy arrays
+                return build_list_converter(port)(value)
+
+            batch_shrinker = get_batch_shrinker(port, structure_registry)
+            if batch_shrinker is not None:
+                return await abatch_shrink(port, value, batch_shrinker)
+
             return await asyncio.gather(
                 *[
                     ashrink_arg(port.child, item, structure_registry=structure_registry)
@@ -187,6 +197,13 @@ async def aexpand_return(
         }
 
     if port.kind == PortKind.LIST:
+        if is_scalar_list(port):
+            return build_list_converter(port)(value)
+
+        batch_expander = get_batch_expander(port, structure_registry)
+        if batch_expander is not None:
+            return await abatch_expand(port, value, batch_expander)
+
         return await asyncio.gather(
             *[
                 aexpand_return(port.child, item, structure_registry=structure_registry)
@@ -0,0 +1,62 @@
+from typing import Any, Callable, Iterable, List, Union
+from rekuest.api.schema import PortFragment, PortKind, ChildPortFragment
+
+
+SCALAR_CONVERTERS = {
+    PortKind.INT: int,
+    PortKind.FLOAT: float,
+    PortKind.BOOL: bool,
+}
+""" The scalar port kinds that can be converted in bulk"""
+
+
+def is_scalar_list(port: Union[PortFragment, ChildPortFragment]) -> bool:
+    """Checks if a port is a list of non nullable scalars (int, float, bool)
+
+    Lists of nullable scalars are not vectorized, as every item would need
+    its own null check.
+    """
+    child = getattr(port, "child", None)
+    return (
+        port.kind == PortKind.LIST
+        and child is not None
+        and child.kind in SCALAR_CONVERTERS
+        and not child.nullable
+    )
+
+
+def as_list(value: Iterable[Any]) -> List[Any]:
+    """Converts a list like value to a list
+
+    Accepts lists, tuples, `array.array` and NumPy arrays. Arrays are
+    converted through their `tolist` method, which converts all items to
+    python scalars in one pass.
+    """
+    if isinstance(value, list):
+        return value
+
+    tolist = getattr(value, "tolist", None)
+    if tolist is not None:
+        return tolist()
+
+    return list(value)
+
+
+def build_list_converter(
+    port: Union[PortFragment, ChildPortFragment]
+) -> Callable[[Iterable[Any]], List[Any]]:
+    """Builds a converter that converts a scalar list port in one pass
+
+    Args:
+        port (Union[PortFragment, ChildPortFragment]): A scalar list port (see is_scalar_list)
+
+    Returns:
+        Callable[[Iterable[Any]], List[Any]]: The converter
+    """
+    assert is_scalar_list(port), f"{port} is not a list of non nullable scalars"
+    scalar = SCALAR_CONVERTERS[port.child.kind]
+
+    def convert(value: Iterable[Any]) -> List[Any]:
+        return list(map(scalar, as_list(value)))
+
+    return convert
@@ -205,3 +205,42 @@ async def nested_structure_asyncgenerator(
     while True:
         await asyncio.sleep(0.2)
         yield "tested", {"peter": SecondObject(6)}
+
+
+WORKER_STATE = {}
+
+
+def initialize_worker(offset: int) -> None:
+    WORKER_STATE["offset"] = offset
+
+
+def fail_to_initialize_worker(offset: int) -> None:
+    raise RuntimeError("Worker can't be initialized")
+
+
+def offset_in_worker(x: int) -> int:
+    """Offset
+
+    Adds the offset of the initialized worker
+
+    """
+    return x + WORKER_STATE["offset"]
+
+
+def double_in_process(x: int) -> int:
+    """Double
+
+    Doubles a value (in another process)
+
+    """
+    return x * 2
+
+
+def count_in_process(n: int) -> int:
+    """Count
+
+    Counts up to n (in another process)
+
+    """
+    for i in range(n):
+        yield i
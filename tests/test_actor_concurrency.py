@@ -0,0 +1,445 @@
+import asyncio
+import pytest
+from typing import Optional
+from rekuest.actors.actify import reactify
+from rekuest.actors.base import Actor
+from rekuest.actors.executors import ThreadPoolRegistry
+from rekuest.actors.memoize import ResultCache
+from rekuest.actors.types import Assignment, Passport, Unassignment
+from rekuest.api.schema import AssignationStatus
+from rekuest.collection.collector import Collector
+from rekuest.structures.registry import Scope
+from .funcs import fail_to_initialize_worker, initialize_worker, offset_in_worker
+from .structures import GlobalObject
+
+
+class RecordingAssignTransport:
+    def __init__(self, assignment, changes, returns):
+        self.assignment = assignment
+        self.changes = changes
+        self.returns = returns
+
+    async def change(self, status=None, message=None, returns=None, progress=None):
+        self.changes.append((self.assignment.id, status))
+        if returns is not None:
+            self.returns[self.assignment.id] = returns
+
+    async def log(self, level=None, message=None):
+        pass
+
+
+class RecordingActorTransport:
+    def __init__(self, passport):
+        self.passport = passport
+        self.changes = []
+        self.returns = {}
+
+    async def change(self, status=None, message=None, mode=None):
+        pass
+
+    async def log(self, level=None, message=None):
+        pass
+
+    def spawn(self, assignment):
+        return RecordingAssignTransport(assignment, self.changes, self.returns)
+
+
+class MockAgent:
+    async def abuild_actor_for_template(self, template, passport, transport):
+        raise NotImplementedError()
+
+
+class BlockingActor(Actor):
+    running: int = 0
+    peak: int = 0
+
+    async def on_assign(self, assignment, collector, transport):
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        await asyncio.sleep(0.01)
+        self.running -= 1
+        await transport.change(status=AssignationStatus.DONE)
+
+
+def build_actor(**kwargs) -> BlockingActor:
+    passport = Passport(instance_id="test", provision="1")
+    return BlockingActor(
+        passport=passport,
+        transport=RecordingActorTransport(passport),
+        collector=Collector(),
+        agent=MockAgent(),
+        **kwargs,
+    )
+
+
+@pytest.mark.asyncio
+async def test_max_concurrency_queues_assignments():
+    actor = build_actor(max_concurrency=2)
+    await actor.arun()
+
+    for i in range(6):
+        await actor.aprocess(Assignment(id=str(i), assignation=str(i)))
+
+    await asyncio.sleep(0.1)
+    await actor.acancel()
+
+    assert actor.peak == 2, "At most two assignments should run at once"
+    statuses = actor.transport.changes
+    assert statuses.count((str(5), AssignationStatus.RECEIVED)) == 1
+    assert all((str(i), AssignationStatus.DONE) in statuses for i in range(6))
+
+
+@pytest.mark.asyncio
+async def test_max_queued_denies_and_cancels_queued():
+    actor = build_actor(max_concurrency=1, max_queued=1)
+    await actor.arun()
+
+    for i in range(3):
+        await actor.aprocess(Assignment(id=str(i), assignation=str(i)))
+
+    await actor.aprocess(Unassignment(id="1", assignation="1"))
+    await asyncio.sleep(0.05)
+    await actor.acancel()
+
+    statuses = actor.transport.changes
+    assert ("2", AssignationStatus.DENIED) in statuses
+    assert ("1", AssignationStatus.CANCELLED) in statuses
+    assert ("1", AssignationStatus.DONE) not in statuses
+    assert ("0", AssignationStatus.DONE) in statuses
+
+
+@pytest.mark.asyncio
+async def test_finished_assignments_are_reaped():
+    actor = build_actor()
+    await actor.arun()
+
+    for i in range(5):
+        await actor.aprocess(Assignment(id=str(i), assignation=str(i)))
+
+    assert actor.tracked_entries()["running_tasks"] == 5
+    await asyncio.sleep(0.05)
+
+    await actor.aprocess(Assignment(id="cancel", assignation="cancel"))
+    await actor.aprocess(Unassignment(id="cancel", assignation="cancel"))
+    await actor.acancel()
+
+    assert ("cancel", AssignationStatus.CANCELLED) in actor.transport.changes
+    assert actor.tracked_entries()["running_tasks"] == 0
+    assert actor.tracked_entries()["running_transports"] == 0
+
+
+class RecordingActor(Actor):
+    started: list = []
+
+    async def on_assign(self, assignment, collector, transport):
+        self.started.append(assignment.id)
+        await transport.change(status=AssignationStatus.DONE)
+
+
+@pytest.mark.asyncio
+async def test_inbox_prioritizes_unassignments_and_priority():
+    passport = Passport(instance_id="test", provision="1")
+    actor = RecordingActor(
+        passport=passport,
+        transport=RecordingActorTransport(passport),
+        collector=Collector(),
+        agent=MockAgent(),
+        started=[],
+    )
+    await actor.arun()
+
+    # Nothing is processed until we yield to the event loop
+    await actor.apass(Assignment(id="low", assignation="low"))
+    await actor.apass(Assignment(id="cancelled", assignation="cancelled"))
+    await actor.apass(Assignment(id="high", assignation="high", priority=10))
+    await actor.apass(Unassignment(id="cancelled", assignation="cancelled"))
+
+    await asyncio.sleep(0.05)
+    await actor.acancel()
+
+    assert actor.started == ["high", "low"]
+    assert ("cancelled", AssignationStatus.CANCELLED) in actor.transport.changes
+
+
+@pytest.mark.asyncio
+async def test_batched_actor_calls_function_once(simple_registry):
+    calls = []
+
+    async def double(value: int) -> int:
+        """Double
+
+        Doubles a batch of values
+
+        """
+        calls.append(value)
+        return [v * 2 for v in value]
+
+    definition, builder = reactify(
+        double, simple_registry, batch=True, batch_size=3, batch_window=0.01
+    )
+    passport = Passport(instance_id="test", provision="1")
+    actor = builder(
+        passport=passport,
+        transport=RecordingActorTransport(passport),
+        collector=Collector(),
+        agent=MockAgent(),
+    )
+    await actor.arun()
+
+    for i in range(4):
+        await actor.apass(Assignment(id=str(i), assignation=str(i), args=[i]))
+
+    await asyncio.sleep(0.05)
+    await actor.acancel()
+
+    assert calls == [[0, 1, 2], [3]]
+    assert actor.transport.returns == {"0": (0,), "1": (2,), "2": (4,), "3": (6,)}
+
+
+@pytest.mark.asyncio
+async def test_batched_actor_fills_missing_args_with_none(simple_registry):
+    async def add(value: int, offset: Optional[int] = None) -> int:
+        """Add
+
+        Adds an optional offset to a batch of values
+
+        """
+        return [v + (o or 0) for v, o in zip(value, offset)]
+
+    definition, builder = reactify(
+        add, simple_registry, batch=True, batch_size=2, bypass_expand=True
+    )
+    passport = Passport(instance_id="test", provision="1")
+    actor = builder(
+        passport=passport,
+        transport=RecordingActorTransport(passport),
+        collector=Collector(),
+        agent=MockAgent(),
+    )
+    await actor.arun()
+
+    await actor.apass(Assignment(id="0", assignation="0", args=[1, None]))
+    await actor.apass(Assignment(id="1", assignation="1", args=[1, 2]))
+
+    await asyncio.sleep(0.05)
+    await actor.acancel()
+
+    assert actor.transport.returns == {"0": (1,), "1": (3,)}
+
+
+@pytest.mark.asyncio
+async def test_batched_actor_cancels_running_batches_on_unprovide(simple_registry):
+    started = asyncio.Event()
+
+    async def wait(value: int) -> int:
+        """Wait
+
+        Waits forever
+
+        """
+        started.set()
+        await asyncio.sleep(10)
+        return value
+
+    definition, builder = reactify(wait, simple_registry, batch=True, batch_size=1)
+    passport = Passport(instance_id="test", provision="1")
+    actor = builder(
+        passport=passport,
+        transport=RecordingActorTransport(passport),
+        collector=Collector(),
+        agent=MockAgent(),
+    )
+    await actor.arun()
+    await actor.apass(Assignment(id="0", assignation="0", args=[1]))
+    await asyncio.wait_for(started.wait(), timeout=1)
+
+    tasks = set(actor._batch_tasks)
+    assert len(tasks) == 1, "Running batches should be tracked"
+
+    await asyncio.wait_for(actor.acancel(), timeout=1)
+
+    assert all(task.cancelled() for task in tasks)
+    assert actor._batch_tasks == set()
+
+
+@pytest.mark.asyncio
+async def test_pooled_process_actor_initializes_workers(simple_registry):
+    definition, builder = reactify(
+        offset_in_worker,
+        simple_registry,
+        in_process=True,
+        process_pool_size=1,
+        process_initializer=initialize_worker,
+        process_initargs=(10,),
+    )
+    passport = Passport(instance_id="test", provision="1")
+    actor = builder(
+        passport=passport,
+        transport=RecordingActorTransport(passport),
+        collector=Collector(),
+        agent=MockAgent(),
+    )
+    await actor.arun()
+
+    for i in range(2):
+        await actor.apass(Assignment(id=str(i), assignation=str(i), args=[i]))
+
+    for _ in range(100):
+        if len(actor.transport.returns) == 2:
+            break
+        await asyncio.sleep(0.1)
+
+    await actor.acancel()
+
+    assert actor.transport.returns == {"0": (10,), "1": (11,)}
+
+
+@pytest.mark.asyncio
+async def test_pooled_process_actor_shuts_down_pool_on_failed_start(simple_registry):
+    definition, builder = reactify(
+        offset_in_worker,
+        simple_registry,
+        in_process=True,
+        process_pool_size=1,
+        process_initializer=fail_to_initialize_worker,
+        process_initargs=(10,),
+    )
+    passport = Passport(instance_id="test", provision="1")
+    actor = builder(
+        passport=passport,
+        transport=RecordingActorTransport(passport),
+        collector=Collector(),
+        agent=MockAgent(),
+    )
+
+    await asyncio.wait_for(actor.provide(), timeout=30)
+
+    assert actor._pool is None, "The broken pool should be shut down"
+
+
+@pytest.mark.asyncio
+async def test_threaded_actors_share_named_pool(simple_registry):
+    registry = ThreadPoolRegistry()
+
+    def add_one(x: int) -> int:
+        """Add one
+
+        Adds one
+
+        """
+        return x + 1
+
+    definition, builder = reactify(add_one, simple_registry, executor_name="shared")
+
+    actors = []
+    for i in range(2):
+        passport = Passport(instance_id="test", provision=str(i))
+        actor = builder(
+            passport=passport,
+            transport=RecordingActorTransport(passport),
+            collector=Collector(),
+            agent=MockAgent(),
+            thread_pool_registry=registry,
+        )
+        await actor.arun()
+        await actor.apass(Assignment(id=str(i), assignation=str(i), args=[i]))
+        actors.append(actor)
+
+    await asyncio.sleep(0.1)
+    assert actors[0].get_executor() is actors[1].get_executor()
+    assert registry.running_pools() == {"shared": 2}
+    assert [actor.transport.returns for actor in actors] == [{"0": (1,)}, {"1": (2,)}]
+
+    for actor in actors:
+        await actor.acancel()
+
+    assert registry.running_pools() == {}, "Pool should be released on unprovide"
+
+
+@pytest.mark.asyncio
+async def test_memoized_actor_skips_repeated_calls(simple_registry, tmp_path):
+    calls = []
+
+    async def square(x: int) -> int:
+        """Square
+
+        Squares a value
+
+        """
+        calls.append(x)
+        return x * x
+
+    cache = ResultCache(path=str(tmp_path / "results"))
+    definition, builder = reactify(square, simple_registry, cache=cache)
+    passport = Passport(instance_id="test", provision="1")
+    actor = builder(
+        passport=passport,
+        transport=RecordingActorTransport(passport),
+        collector=Collector(),
+        agent=MockAgent(),
+    )
+    await actor.arun()
+
+    for i, x in enumerate([3, 3, 4]):
+        await actor.apass(Assignment(id=str(i), assignation=str(i), args=[x]))
+        while str(i) not in actor.transport.returns:
+            await asyncio.sleep(0.01)
+
+    await actor.acancel()
+
+    assert calls == [3, 4]
+    assert actor.transport.returns == {"0": (9,), "1": (9,), "2": (16,)}
+
+    cache.close()
+    reopened = ResultCache(path=str(tmp_path / "results"))
+    key = reopened.key_for(actor._definition_hash, [4])
+    assert reopened.get(key) == (True, (16,)), "Results should persist on disk"
+    reopened.close()
+
+
+@pytest.mark.asyncio
+async def test_memoized_actor_reuses_global_structures(simple_registry):
+    async def ashrink(o: GlobalObject) -> str:
+        return str(o.number)
+
+    async def aexpand(id: str) -> GlobalObject:
+        return GlobalObject(number=int(id))
+
+    simple_registry.register_as_structure(
+        GlobalObject,
+        identifier="global",
+        scope=Scope.GLOBAL,
+        aexpand=aexpand,
+        ashrink=ashrink,
+    )
+    calls = []
+
+    async def create(x: int) -> GlobalObject:
+        """Create
+
+        Creates a global object
+
+        """
+        calls.append(x)
+        return GlobalObject(number=x)
+
+    cache = ResultCache()
+    definition, builder = reactify(create, simple_registry, cache=cache)
+    passport = Passport(instance_id="test", provision="1")
+    actor = builder(
+        passport=passport,
+        transport=RecordingActorTransport(passport),
+        collector=Collector(),
+        agent=MockAgent(),
+    )
+    await actor.arun()
+
+    for i in range(2):
+        await actor.apass(Assignment(id=str(i), assignation=str(i), args=[3]))
+        while str(i) not in actor.transport.returns:
+            await asyncio.sleep(0.01)
+
+    await actor.acancel()
+
+    assert calls == [3], "Global structures should be memoized"
+    assert actor.transport.returns == {"0": ("3",), "1": ("3",)}
@@ -0,0 +1,175 @@
+import asyncio
+import pytest
+from rekuest.agents.base import BaseAgent
+from rekuest.agents.templates import TemplateCache
+from rekuest.agents.transport.mock import MockAgentTransport
+from rekuest.api.schema import TemplateFragment
+from rekuest.definition.registry import DefinitionRegistry
+from rekuest.messages import Assignation, Provision
+from rekuest.register import register_func
+import rekuest.agents.base
+from .funcs import plain_basic_function
+from .mocks import MockRequestRath
+
+
+def build_template(id: str, interface: str) -> TemplateFragment:
+    return TemplateFragment.parse_obj(
+        {
+            "id": id,
+            "interface": interface,
+            "agent": {"registry": None},
+            "extensions": [],
+            "node": {
+                "hash": interface,
+                "id": id,
+                "name": interface,
+                "kind": "FUNCTION",
+                "args": [],
+                "returns": [],
+                "description": "mock",
+                "scope": "GLOBAL",
+            },
+        }
+    )
+
+
+class MockTemplateServer:
+    def __init__(self) -> None:
+        self.calls = 0
+        self.running = 0
+        self.peak = 0
+
+    async def acreate_template(self, definition, interface, instance_id, rath):
+        self.calls += 1
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        await asyncio.sleep(0.01)
+        self.running -= 1
+        return build_template(f"{interface}-{self.calls}", interface)
+
+
+def build_agent(simple_registry, template_cache: TemplateCache) -> BaseAgent:
+    definition_registry = DefinitionRegistry()
+    for i in range(6):
+        register_func(
+            plain_basic_function,
+            structure_registry=simple_registry,
+            definition_registry=definition_registry,
+            interface=f"interface_{i}",
+        )
+
+    return BaseAgent(
+        rath=MockRequestRath(),
+        transport=MockAgentTransport(),
+        definition_registry=definition_registry,
+        template_cache=template_cache,
+        registration_concurrency=2,
+    )
+
+
+@pytest.mark.asyncio
+async def test_register_definitions_concurrently_and_cached(
+    simple_registry, tmp_path, monkeypatch
+):
+    server = MockTemplateServer()
+    monkeypatch.setattr(
+        rekuest.agents.base, "acreate_template", server.acreate_template
+    )
+
+    path = str(tmp_path / "templates.json")
+    agent = build_agent(simple_registry, TemplateCache(path))
+    await agent.aregister_definitions()
+
+    assert server.calls == 6
+    assert server.peak == 2, "Registration should be bounded by the concurrency"
+    assert len(agent.interface_template_map) == 6
+
+    restarted = build_agent(simple_registry, TemplateCache(path))
+    await restarted.aregister_definitions()
+
+    assert server.calls == 6, "Unchanged definitions should not be recreated"
+    assert restarted.interface_template_map == agent.interface_template_map
+
+
+@pytest.mark.asyncio
+async def test_failed_registration_still_caches_created_templates(
+    simple_registry, tmp_path, monkeypatch
+):
+    server = MockTemplateServer()
+
+    async def acreate_template(definition, interface, instance_id, rath):
+        if interface == "interface_0":
+            raise ValueError("Template was rejected")
+        return await server.acreate_template(definition, interface, instance_id, rath)
+
+    monkeypatch.setattr(rekuest.agents.base, "acreate_template", acreate_template)
+
+    path = str(tmp_path / "templates.json")
+    agent = build_agent(simple_registry, TemplateCache(path))
+    with pytest.raises(ValueError):
+        await agent.aregister_definitions()
+
+    assert server.calls == 5, "The other registrations should finish"
+    assert server.running == 0
+
+    restarted = build_agent(simple_registry, TemplateCache(path))
+    with pytest.raises(ValueError):
+        await restarted.aregister_definitions()
+
+    assert server.calls == 5, "Created templates should have been cached"
+
+
+@pytest.mark.asyncio
+async def test_provision_uses_registered_templates(simple_registry, monkeypatch):
+    server = MockTemplateServer()
+    monkeypatch.setattr(
+        rekuest.agents.base, "acreate_template", server.acreate_template
+    )
+
+    async def aget_template(id, rath=None):
+        raise AssertionError("Registered templates should not be fetched")
+
+    monkeypatch.setattr(rekuest.agents.base, "aget_template", aget_template)
+
+    agent = build_agent(simple_registry, TemplateCache())
+    await agent.aregister_definitions()
+
+    template = agent.interface_template_map["interface_3"]
+    actor = await agent.aspawn_actor_from_provision(
+        Provision(provision="1", template=template.id, guardian="1")
+    )
+    await actor.acancel()
+
+    assert agent.template_cache.get_by_id(template.id) == template
+
+
+class RecordingAgent(BaseAgent):
+    processed: list = []
+
+    async def aprocess_message(self, message):
+        if isinstance(message, Provision):
+            await asyncio.sleep(0.05)
+        self.processed.append((type(message).__name__, message.provision))
+
+
+@pytest.mark.asyncio
+async def test_provisions_do_not_stall_other_messages():
+    agent = RecordingAgent(
+        rath=MockRequestRath(),
+        transport=MockAgentTransport(),
+        definition_registry=DefinitionRegistry(),
+        processed=[],
+    )
+
+    await agent.process(Provision(provision="slow", template="1", guardian="1"))
+    await agent.process(Assignation(assignation="1", provision="slow"))
+    await agent.process(Assignation(assignation="2", provision="other"))
+
+    assert agent.processed == [("Assignation", "other")]
+
+    await asyncio.sleep(0.1)
+    assert agent.processed == [
+        ("Assignation", "other"),
+        ("Provision", "slow"),
+        ("Assignation", "slow"),
+    ], "Messages of the same provision should keep their order"
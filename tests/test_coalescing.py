@@ -0,0 +1,49 @@
+import asyncio
+import pytest
+from rekuest.actors.transport.coalescing import CoalescingAssignTransport
+from rekuest.actors.types import Assignment
+from rekuest.api.schema import AssignationStatus, LogLevelInput
+
+
+class RecordingAssignTransport:
+    def __init__(self) -> None:
+        self.assignment = Assignment(assignation="1", args=[], user="1")
+        self.sent = []
+
+    async def change(self, status=None, message=None, returns=None, progress=None):
+        self.sent.append(("change", status, progress))
+
+    async def log(self, level=None, message=None):
+        self.sent.append(("log", level, message))
+
+
+@pytest.mark.asyncio
+async def test_progress_is_coalesced():
+    recorder = RecordingAssignTransport()
+    transport = CoalescingAssignTransport(recorder, flush_interval=0.02)
+
+    for i in range(100):
+        await transport.change(status=AssignationStatus.PROGRESS, progress=i)
+
+    assert recorder.sent == [], "Progress should be held back"
+    await asyncio.sleep(0.05)
+    assert recorder.sent == [("change", AssignationStatus.PROGRESS, 99)]
+
+
+@pytest.mark.asyncio
+async def test_logs_are_batched_and_terminal_status_is_not_delayed():
+    recorder = RecordingAssignTransport()
+    transport = CoalescingAssignTransport(recorder, flush_interval=10)
+
+    await transport.log(level=LogLevelInput.INFO, message="a")
+    await transport.log(level=LogLevelInput.INFO, message="b")
+    await transport.log(level=LogLevelInput.ERROR, message="c")
+    await transport.change(status=AssignationStatus.PROGRESS, progress=50)
+    await transport.change(status=AssignationStatus.RETURNED, returns=[1])
+
+    assert recorder.sent == [
+        ("log", LogLevelInput.INFO, "a\nb"),
+        ("log", LogLevelInput.ERROR, "c"),
+        ("change", AssignationStatus.PROGRESS, 50),
+        ("change", AssignationStatus.RETURNED, None),
+    ], "Pending updates should be flushed in order before the terminal status"
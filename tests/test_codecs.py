@@ -0,0 +1,63 @@
+import pytest
+from rekuest.agents.transport.protocols.agent_json import (
+    AgentMessageTypes,
+    AssignationChangedMessage,
+    encode_batch,
+)
+from rekuest.api.schema import AssignationStatus
+from rekuest.codecs import CodecException, MsgpackCodec, get_codec, negotiate_codec
+
+
+@pytest.mark.parametrize("name", ["json", "orjson", "msgpack"])
+def test_codecs_roundtrip_messages_and_batches(name):
+    try:
+        codec = get_codec(name)
+    except CodecException:
+        pytest.skip(f"{name} is not installed")
+
+    messages = [
+        AssignationChangedMessage(
+            assignation=str(i), status=AssignationStatus.RETURNED, returns=[i, "a"]
+        )
+        for i in range(3)
+    ]
+
+    decoded = codec.loads(codec.encode(messages[0]))
+    assert decoded["type"] == AgentMessageTypes.ASSIGN_CHANGED
+    assert decoded["returns"] == [0, "a"]
+    assert AssignationChangedMessage(**decoded).meta == messages[0].meta
+
+    batch = codec.loads(encode_batch([codec.encode(m) for m in messages], codec=codec))
+    assert batch["type"] == AgentMessageTypes.BATCH
+    assert [m["assignation"] for m in batch["messages"]] == ["0", "1", "2"]
+
+
+def test_negotiation_falls_back_to_json():
+    try:
+        codec = MsgpackCodec()
+    except CodecException:
+        pytest.skip("msgpack is not installed")
+
+    assert negotiate_codec(codec, codec.subprotocol) is codec
+    assert negotiate_codec(codec, None).subprotocol is None
+
+
+def test_unknown_codec_raises():
+    with pytest.raises(CodecException):
+        get_codec("xml")
+
+
+def test_orjson_falls_back_to_json_for_rejected_payloads():
+    try:
+        codec = get_codec("orjson")
+    except CodecException:
+        pytest.skip("orjson is not installed")
+
+    message = AssignationChangedMessage(
+        assignation="1",
+        status=AssignationStatus.RETURNED,
+        returns=[{1: "a"}, 2**70],
+    )
+
+    decoded = codec.loads(codec.encode(message))
+    assert decoded["returns"] == [{"1": "a"}, 2**70]
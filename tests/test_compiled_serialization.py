@@ -0,0 +1,161 @@
+import array
+import pytest
+from typing import List
+from rekuest.definition.define import prepare_definition
+from rekuest.structures.serialization.actor import expand_inputs, shrink_outputs
+from rekuest.structures.serialization.postman import shrink_inputs
+from rekuest.structures.serialization.vectorized import is_scalar_list
+from rekuest.structures.serialization.compiled import (
+    compile_definition,
+    compile_sync_expander,
+    reaches_structure,
+)
+from .funcs import (
+    plain_basic_function,
+    nested_basic_function,
+    plain_structure_function,
+    nested_structure_function,
+    null_function,
+)
+from .structures import SecondObject, SerializableObject
+from rekuest.structures.errors import ExpandingError, ShrinkingError
+
+
+@pytest.mark.expand
+@pytest.mark.asyncio
+async def test_compiled_expand_matches(simple_registry):
+    functional_definition = prepare_definition(
+        nested_structure_function, structure_registry=simple_registry
+    )
+    compiled = compile_definition(functional_definition, simple_registry)
+
+    args = (["3"], {"lala": "3"})
+
+    assert await compiled.aexpand_inputs(args) == await expand_inputs(
+        functional_definition, args, simple_registry
+    )
+
+
+@pytest.mark.expand
+@pytest.mark.asyncio
+async def test_compiled_expand_nullable(simple_registry):
+    functional_definition = prepare_definition(
+        null_function, structure_registry=simple_registry
+    )
+    compiled = compile_definition(functional_definition, simple_registry)
+
+    assert await compiled.aexpand_inputs((None,)) == {"x": None}
+    assert await compiled.aexpand_inputs((1,)) == {"x": 1}
+
+
+@pytest.mark.expand
+@pytest.mark.asyncio
+async def test_compiled_expand_structure_error(simple_registry):
+    functional_definition = prepare_definition(
+        plain_structure_function, structure_registry=simple_registry
+    )
+    compiled = compile_definition(functional_definition, simple_registry)
+
+    with pytest.raises(ExpandingError):
+        await compiled.aexpand_inputs(
+            (SerializableObject(number=3), SecondObject(id=4))
+        )
+
+
+@pytest.mark.shrink
+@pytest.mark.asyncio
+async def test_compiled_shrink_matches(simple_registry):
+    functional_definition = prepare_definition(
+        nested_basic_function, structure_registry=simple_registry
+    )
+    compiled = compile_definition(functional_definition, simple_registry)
+
+    returns = (["hallo", "welt"], 6)
+
+    assert await compiled.ashrink_outputs(returns) == await shrink_outputs(
+        functional_definition, returns, simple_registry
+    )
+
+
+@pytest.mark.shrink
+@pytest.mark.asyncio
+async def test_compiled_shrink_basic(simple_registry):
+    functional_definition = prepare_definition(
+        plain_basic_function, structure_registry=simple_registry
+    )
+    compiled = compile_definition(functional_definition, simple_registry)
+
+    assert await compiled.ashrink_outputs("hallo") == ("hallo",)
+
+    with pytest.raises(ShrinkingError):
+        await compiled.ashrink_outputs((None,))
+
+
+def list_float_function(values: List[float]) -> List[float]:
+    """List Karl
+
+    Karl takes a list of floats
+
+    Args:
+        values (List[float]): The values
+
+    Returns:
+        List[float]: The values
+    """
+    return values
+
+
+@pytest.mark.expand
+@pytest.mark.asyncio
+async def test_compiled_scalar_list_is_sync(simple_registry):
+    functional_definition = prepare_definition(
+        list_float_function, structure_registry=simple_registry
+    )
+    compiled = compile_definition(functional_definition, simple_registry)
+
+    port = compiled.definition.args[0]
+    assert not reaches_structure(port), "Floats should not reach a structure"
+
+    expand = compile_sync_expander(port, simple_registry)
+    assert expand(["1", 2, 3.5]) == [1.0, 2.0, 3.5]
+
+    args = await compiled.aexpand_inputs(([1, 2, 3],))
+    assert args == {"values": [1.0, 2.0, 3.0]}
+
+    returns = await compiled.ashrink_outputs([1, 2, 3])
+    assert returns == ([1.0, 2.0, 3.0],)
+
+    assert await expand_inputs(functional_definition, ([1, 2],), simple_registry) == {
+        "values": [1.0, 2.0]
+    }
+
+
+def test_reaches_structure(simple_registry):
+    functional_definition = compile_definition(
+        prepare_definition(
+            nested_structure_function, structure_registry=simple_registry
+        ),
+        simple_registry,
+    ).definition
+
+    assert all(reaches_structure(port) for port in functional_definition.args)
+
+
+@pytest.mark.shrink
+@pytest.mark.asyncio
+async def test_vectorized_list_accepts_arrays(simple_registry):
+    functional_definition = prepare_definition(
+        list_float_function, structure_registry=simple_registry
+    )
+    compiled = compile_definition(functional_definition, simple_registry)
+
+    port = compiled.definition.returns[0]
+    assert is_scalar_list(port), "Should be vectorized"
+
+    returns = await compiled.ashrink_outputs(array.array("d", [1, 2, 3]))
+    assert returns == ([1.0, 2.0, 3.0],)
+
+    shrunk = await shrink_inputs(
+        compiled.definition, (array.array("i", [1, 2]),), {}, simple_registry
+    )
+    assert shrunk == {"values": [1.0, 2.0]}
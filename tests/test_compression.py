@@ -0,0 +1,71 @@
+import json
+import pytest
+from rekuest.agents.transport.protocols.agent_json import (
+    AssignationChangedMessage,
+)
+from rekuest.api.schema import AssignationStatus
+from rekuest.codecs import get_codec
+from rekuest.compression import (
+    CompressionException,
+    compress_frame,
+    decompress_frame,
+    get_compressor,
+)
+from .test_websocket_transport import build_transport
+
+
+@pytest.mark.parametrize("name", ["deflate", "zstd"])
+@pytest.mark.parametrize("codec", ["json", "msgpack"])
+def test_frames_roundtrip_above_threshold(name, codec):
+    try:
+        compressor = get_compressor(name)
+    except CompressionException:
+        pytest.skip(f"{name} is not installed")
+    codec = get_codec(codec)
+
+    small = codec.encode(
+        AssignationChangedMessage(assignation="1", status=AssignationStatus.PROGRESS)
+    )
+    assert compress_frame(small, compressor, threshold=1024) is small
+
+    large = codec.encode(
+        AssignationChangedMessage(
+            assignation="1",
+            status=AssignationStatus.RETURNED,
+            returns=[["value"] * 2000],
+        )
+    )
+    compressed = compress_frame(large, compressor, threshold=1024)
+    assert len(compressed) < len(large) / 2
+    assert codec.loads(decompress_frame(compressed))["returns"] == [["value"] * 2000]
+
+
+@pytest.mark.asyncio
+async def test_agent_only_compresses_if_server_supports_it():
+    transport = await build_transport(features=["DEFLATE"])
+    assert transport._compressor is None, "Compression was not configured"
+
+    transport = await build_transport(features=["DEFLATE"], compression="deflate")
+    transport.compression_threshold = 100
+
+    class RawClient:
+        sent = []
+
+        async def send(self, frame):
+            self.sent.append(frame)
+
+    client = RawClient()
+    await transport.asend(
+        client,
+        [
+            transport.encode(
+                AssignationChangedMessage(
+                    assignation="1",
+                    status=AssignationStatus.RETURNED,
+                    returns=["x" * 1000],
+                )
+            )
+        ],
+    )
+    assert isinstance(client.sent[0], bytes)
+    assert json.loads(decompress_frame(client.sent[0]))["returns"] == ["x" * 1000]
@@ -1,3 +1,5 @@
+import time
+from enum import Enum
 from rekuest.api.schema import DefinitionInput, PortKind, AnnotationKind
 import pytest
 from .structures import SecondSerializableObject, SerializableObject
@@ -15,6 +17,7 @@ from .funcs import (
     annotated_nested_structure_function,
     null_function,
 )
+from rekuest.definition.cache import DefinitionCache
 from rekuest.definition.validate import auto_validate
 from rekuest.structures.serialization.postman import shrink_inputs
 
@@ -245,3 +248,126 @@ async def test_shrinking(simple_registry):
 
     args = await shrink_inputs(definition, ("hallo", "zz"), {}, simple_registry)
     assert args == {"name": "zz", "rep": "hallo"}
+
+
+@pytest.mark.define
+def test_auto_validate_is_memoized(simple_registry):
+    functional_definition = prepare_definition(
+        plain_basic_function, structure_registry=simple_registry
+    )
+
+    first = auto_validate(functional_definition)
+    assert auto_validate(functional_definition) is first, "Should be memoized"
+
+    other_definition = prepare_definition(
+        plain_basic_function, structure_registry=simple_registry
+    )
+    assert auto_validate(other_definition) == first
+
+
+def test_definition_cache_skips_rebuilding(simple_registry, tmp_path):
+    cache = DefinitionCache(str(tmp_path))
+
+    functional_definition = prepare_definition(
+        nested_structure_function, simple_registry, definition_cache=cache
+    )
+    assert cache.misses == 1
+
+    cached_definition = prepare_definition(
+        nested_structure_function, simple_registry, definition_cache=cache
+    )
+    assert cache.hits == 1
+    assert cached_definition == functional_definition
+
+    prepare_definition(
+        nested_structure_function,
+        simple_registry,
+        name="Other Name",
+        definition_cache=cache,
+    )
+    assert cache.misses == 2, "Changed parameters should not hit the cache"
+
+    cache.put("known", functional_definition, simple_registry)
+    assert cache.get("known", simple_registry) == functional_definition
+    assert (
+        cache.get("known", StructureRegistry()) is None
+    ), "Definitions with unregistered structures should not hit the cache"
+
+
+def build_enum_function(members):
+    Color = Enum("Color", members, module=__name__)
+
+    def paint(color: Color) -> str:
+        """Paint
+
+        Paints in a color
+
+        """
+        return color.name
+
+    return paint
+
+
+def test_definition_cache_is_invalidated_by_changed_enums(simple_registry, tmp_path):
+    cache = DefinitionCache(str(tmp_path))
+
+    prepare_definition(
+        build_enum_function(["RED", "GREEN"]), simple_registry, definition_cache=cache
+    )
+    prepare_definition(
+        build_enum_function(["RED", "GREEN"]), simple_registry, definition_cache=cache
+    )
+    assert cache.hits == 1
+
+    definition = prepare_definition(
+        build_enum_function(["RED", "BLUE"]), simple_registry, definition_cache=cache
+    )
+    assert cache.misses == 2, "An edited enum should not hit the cache"
+    assert [choice.label for choice in definition.args[0].assign_widget.choices] == [
+        "RED",
+        "BLUE",
+    ]
+
+
+def test_definition_cache_registers_structures_on_hit(tmp_path):
+    cache = DefinitionCache(str(tmp_path))
+    definition = prepare_definition(
+        plain_enum_function, StructureRegistry(), definition_cache=cache
+    )
+
+    fresh_registry = StructureRegistry()  # e.g. in a new process
+    cached = prepare_definition(
+        plain_enum_function, fresh_registry, definition_cache=cache
+    )
+
+    assert cache.hits == 1, "Auto registered structures should not cause a miss"
+    assert cached == definition
+    assert definition.args[1].identifier in fresh_registry.identifier_structure_map
+
+
+def test_definition_cache_hit_is_faster_than_defining(simple_registry, tmp_path):
+    cache = DefinitionCache(str(tmp_path))
+    functions = [
+        plain_basic_function,
+        plain_structure_function,
+        plain_enum_function,
+        nested_structure_function,
+        annotated_nested_structure_function,
+    ]
+    for function in functions:
+        prepare_definition(function, simple_registry, definition_cache=cache)
+
+    def timed(definition_cache):
+        start = time.perf_counter()
+        for _ in range(20):
+            for function in functions:
+                prepare_definition(
+                    function, simple_registry, definition_cache=definition_cache
+                )
+        return time.perf_counter() - start
+
+    uncached = timed(None)
+    cached = timed(cache)
+
+    assert cache.misses == len(functions)
+    assert cached < uncached, f"Hits took {cached:.4f}s, defining {uncached:.4f}s"
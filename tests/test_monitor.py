@@ -0,0 +1,37 @@
+import asyncio
+import time
+import pytest
+from rekuest.agents.base import BaseAgent
+from rekuest.agents.hooks import HooksRegistry
+from rekuest.agents.monitor import register_monitor
+from rekuest.agents.transport.mock import MockAgentTransport
+from rekuest.definition.registry import DefinitionRegistry
+from .mocks import MockRequestRath
+from .test_actor_concurrency import build_actor
+
+
+@pytest.mark.asyncio
+async def test_monitor_samples_loop_lag_and_actors():
+    registry = HooksRegistry()
+    agent = BaseAgent(
+        rath=MockRequestRath(),
+        transport=MockAgentTransport(),
+        definition_registry=DefinitionRegistry(),
+        hook_registry=registry,
+    )
+    actor = build_actor()
+    agent.managed_actors[actor.passport.id] = actor
+
+    monitor = register_monitor(agent, sample_interval=0.01, report_interval=None)
+    assert registry.background_worker["agent_monitor"] is monitor
+    assert monitor.agent is agent
+
+    await registry.arun_background({})
+    await asyncio.sleep(0.05)
+    time.sleep(0.1)  # Blocks the event loop
+    await asyncio.sleep(0.05)
+    await registry.astop_background()
+
+    assert monitor.max_loop_lag() >= 0.05
+    assert monitor.latest.actors[0].provision == actor.passport.provision
+    assert monitor.latest.actors[0].running_tasks == 0
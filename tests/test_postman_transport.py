@@ -0,0 +1,82 @@
+import asyncio
+import json
+import pytest
+from rekuest.codecs import CodecException, get_codec
+from rekuest.compression import decompress_frame, get_compressor
+from rekuest.postmans.transport.protocols.postman_json import (
+    AssignPub,
+    PostmanMessageTypes,
+    UnassignPub,
+)
+from rekuest.postmans.transport.errors import UnassignDeniedError
+from rekuest.postmans.transport.websocket import WebsocketPostmanTransport
+
+
+class RawClient:
+    def __init__(self) -> None:
+        self.sent = []
+
+    async def send(self, frame):
+        self.sent.append(frame)
+
+
+def build_transport(codec: str = "json", compressor=None) -> WebsocketPostmanTransport:
+    transport = WebsocketPostmanTransport()
+    transport._connected = True
+    transport._futures = {}
+    transport._send_queue = asyncio.Queue()
+    transport._codec = get_codec(codec)
+    transport._compressor = compressor
+    transport.compression_threshold = 500
+    return transport
+
+
+@pytest.mark.asyncio
+async def test_unencodable_action_only_fails_its_call():
+    transport = build_transport()
+    client = RawClient()
+    task = asyncio.create_task(transport.sending(client))
+
+    with pytest.raises(TypeError):
+        await asyncio.wait_for(
+            transport.awaitaction(AssignPub(reservation="1", args=[object()])),
+            timeout=1,
+        )
+
+    action = UnassignPub(assignation="1")
+    pending = asyncio.create_task(transport.awaitaction(action))
+    await asyncio.wait_for(transport._send_queue.join(), timeout=1)
+
+    assert not task.done(), "The send task should survive the encode error"
+    assert [transport._codec.loads(frame)["id"] for frame in client.sent] == [action.id]
+
+    await transport.receive(
+        json.dumps(
+            {
+                "id": action.id,
+                "type": PostmanMessageTypes.UNASSIGN_DENIED,
+                "error": "Denied",
+            }
+        )
+    )
+    with pytest.raises(UnassignDeniedError):
+        await asyncio.wait_for(pending, timeout=1)
+
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("codec", ["json", "msgpack"])
+async def test_large_actions_are_compressed(codec):
+    try:
+        transport = build_transport(codec, compressor=get_compressor("deflate"))
+    except CodecException:
+        pytest.skip(f"{codec} is not installed")
+
+    small = transport.encode(AssignPub(reservation="1", args=[]))
+    large = transport.encode(AssignPub(reservation="1", args=["x" * 1000]))
+
+    assert transport._codec.loads(small)["args"] == []
+    assert len(large) < 1000
+    assert transport._codec.loads(decompress_frame(large))["args"] == ["x" * 1000]
@@ -53,3 +53,59 @@ def test_structure_registration():
         @classmethod
         async def aexpand(cls, shrinked_value):
             return cls(shrinked_value)
+
+
+@pytest.mark.asyncio
+async def test_immutable_structure_expansion_cache():
+    registry = StructureRegistry()
+    calls = []
+
+    @register_structure(identifier="immutable", registry=registry, immutable=True)
+    class ImmutableObject:
+        def __init__(self, number) -> None:
+            self.number = number
+
+        async def ashrink(self):
+            return self.number
+
+        @classmethod
+        async def aexpand(cls, shrinked_value):
+            calls.append(shrinked_value)
+            return cls(shrinked_value)
+
+    expander = registry.get_expander_for_identifier("immutable")
+    first = await expander("1")
+    second = await expander("1")
+
+    assert first is second, "Should be served from the cache"
+    assert calls == ["1"], "Expander should only be called once"
+
+    registry.clear_expansion_caches()
+    await expander("1")
+    assert calls == ["1", "1"], "Cleared cache should expand again"
+
+
+@pytest.mark.asyncio
+async def test_expansion_cache_ttl():
+    registry = StructureRegistry()
+    calls = []
+
+    @register_structure(
+        identifier="expiring",
+        registry=registry,
+        immutable=True,
+        expansion_cache_ttl=0,
+    )
+    class ExpiringObject:
+        async def ashrink(self):
+            return "1"
+
+        @classmethod
+        async def aexpand(cls, shrinked_value):
+            calls.append(shrinked_value)
+            return cls()
+
+    expander = registry.get_expander_for_identifier("expiring")
+    await expander("1")
+    await expander("1")
+    assert len(calls) == 2, "Expired values should be expanded again"
@@ -0,0 +1,85 @@
+import asyncio
+import pytest
+from rekuest.agents.transport.protocols.agent_json import (
+    AgentFeatures,
+    AssignationChangedMessage,
+)
+from rekuest.agents.transport.replay import ReplayBuffer
+from rekuest.api.schema import AssignationStatus
+from rekuest.agents.transport.websocket import WebsocketAgentTransport
+from .test_websocket_transport import RecordingClient, build_transport, token_loader
+
+
+def build_message(i: int) -> AssignationChangedMessage:
+    return AssignationChangedMessage(
+        assignation=str(i), status=AssignationStatus.RETURNED
+    )
+
+
+def test_acknowledged_messages_are_not_replayed():
+    buffer = ReplayBuffer(maxsize=3)
+    buffer.acknowledged = True
+    for i in range(5):
+        buffer.add(build_message(i))
+
+    buffer.ack(4)  # Sequence numbers start at 1
+    buffer.mark_disconnected()
+
+    assert [m.assignation for m in buffer.replay()] == ["4"]
+    assert buffer.metrics() == {"sent": 5, "replayed": 1, "lost": 2, "buffered": 1}
+    assert buffer.replay() == [], "Messages are only replayed after a disconnect"
+
+
+def test_without_acks_only_recent_messages_are_replayed():
+    buffer = ReplayBuffer(replay_window=0.05)
+    buffer.add(build_message(0))
+    buffer._buffer[0] = (1, buffer._buffer[0][1] - 1, buffer._buffer[0][2])
+    buffer.add(build_message(1))
+    buffer.mark_disconnected()
+
+    assert [m.meta.seq for m in buffer.replay()] == [2]
+
+
+@pytest.mark.asyncio
+async def test_failed_sends_are_replayed_on_reconnect():
+    transport = await build_transport(features=[AgentFeatures.ACK])
+
+    class FailingClient:
+        async def send(self, message):
+            raise ConnectionError("Connection dropped")
+
+    await transport.delayaction(build_message(0))
+    with pytest.raises(ConnectionError):
+        await transport.sending(FailingClient())
+    transport._replay_buffer.mark_disconnected()
+
+    await transport.delayaction(build_message(1))
+    client = RecordingClient()
+    task = asyncio.create_task(transport.sending(client))
+    await asyncio.wait_for(transport._send_queue.join(), timeout=1)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+    assert [m["assignation"] for m in client.sent] == ["0", "1"]
+    assert [m["meta"]["seq"] for m in client.sent] == [1, 2]
+    assert transport.metrics()["replayed"] == 1
+
+
+def test_without_acks_nothing_is_replayed_by_default():
+    buffer = ReplayBuffer()
+    buffer.add(build_message(0))
+    buffer.mark_disconnected()
+
+    assert buffer.replay() == [], "The server might have received it already"
+    assert buffer.metrics() == {"sent": 1, "replayed": 0, "lost": 0, "buffered": 0}
+
+
+def test_retry_delay_backs_off_with_jitter():
+    transport = WebsocketAgentTransport(
+        endpoint_url="ws://localhost", token_loader=token_loader
+    )
+    delays = [transport.retry_delay(retry) for retry in range(6)]
+
+    assert 1.5 <= delays[0] <= 3
+    assert 6 <= delays[2] <= 12
+    assert all(delay <= 30 for delay in delays)
@@ -10,6 +10,8 @@ from .funcs import (
 )
 from .structures import SecondObject, SerializableObject
 from rekuest.structures.errors import ShrinkingError, ExpandingError
+from rekuest.structures.registry import StructureRegistry, Scope
+from rekuest.structures.serialization.compiled import compile_definition
 
 
 @pytest.mark.expand
@@ -132,3 +134,39 @@ async def test_shrink_nested_structure_error(simple_registry):
         ([SerializableObject(number=3)], {"hallo": SerializableObject(number=3)}),
         simple_registry,
     )
+
+
+@pytest.mark.expand
+@pytest.mark.asyncio
+async def test_expand_list_with_batch_expander():
+    registry = StructureRegistry()
+    calls = []
+
+    async def abatch_expand(ids):
+        calls.append(ids)
+        return [SerializableObject(number=int(i)) for i in ids]
+
+    async def abatch_shrink(values):
+        calls.append(values)
+        return [value.number for value in values]
+
+    registry.register_as_structure(
+        SerializableObject,
+        identifier="x",
+        scope=Scope.LOCAL,
+        abatch_expand=abatch_expand,
+        abatch_shrink=abatch_shrink,
+    )
+
+    functional_definition = prepare_definition(
+        nested_structure_function, structure_registry=registry
+    )
+
+    args = await expand_inputs(functional_definition, (["1", "2", "3"], None), registry)
+    assert args["rep"] == [SerializableObject(number=i) for i in (1, 2, 3)]
+    assert calls == [["1", "2", "3"]], "Should expand all items in one call"
+
+    compiled = compile_definition(functional_definition, registry)
+    args = await compiled.aexpand_inputs((["4", "5"], None))
+    assert args["rep"] == [SerializableObject(number=4), SerializableObject(number=5)]
+    assert len(calls) == 2, "Compiled expanders should use the batch expander"
@@ -0,0 +1,95 @@
+import asyncio
+import pytest
+from rekuest.actors.actify import reactify
+from rekuest.actors.types import Assignment, Passport
+from rekuest.api.schema import AssignationStatus
+from rekuest.collection.collector import Collector
+from rekuest.actors.shared_memory import (
+    SharedBuffer,
+    SharedMemoryScope,
+    call_with_shared_memory,
+    iterate_with_shared_memory,
+)
+
+
+def reverse(data, view):
+    return data[::-1], bytes(view)
+
+
+def chunks(data):
+    for i in range(0, len(data), 4):
+        yield data[i : i + 4]
+
+
+def test_large_buffers_are_shared():
+    data = bytes(range(16))
+
+    with SharedMemoryScope(threshold=8) as scope:
+        shared = scope.share_kwargs(
+            {"data": data, "view": memoryview(data), "small": b"abc"}
+        )
+        assert isinstance(shared["data"], SharedBuffer)
+        assert isinstance(shared["view"], SharedBuffer)
+        assert shared["small"] == b"abc", "Small buffers should not be shared"
+
+        del shared["small"]
+        returns = call_with_shared_memory(reverse, 8, shared)
+        assert all(isinstance(value, SharedBuffer) for value in returns)
+        assert scope.collect(returns) == (data[::-1], data)
+
+
+def test_generator_yields_are_shared():
+    data = bytes(range(16))
+
+    with SharedMemoryScope(threshold=4) as scope:
+        shared = scope.share_kwargs({"data": data})
+        yields = [
+            scope.collect(value)
+            for value in iterate_with_shared_memory(chunks, 4, shared)
+        ]
+
+    assert b"".join(yields) == data
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("shared_memory_threshold", [None, 8])
+async def test_processed_actors_run_end_to_end(
+    simple_registry, shared_memory_threshold
+):
+    from .funcs import count_in_process, double_in_process
+    from .test_actor_concurrency import MockAgent, RecordingActorTransport
+
+    for function, args in [(double_in_process, [4]), (count_in_process, [3])]:
+        definition, builder = reactify(
+            function,
+            simple_registry,
+            in_process=True,
+            shared_memory_threshold=shared_memory_threshold,
+        )
+        passport = Passport(instance_id="test", provision="1")
+        actor = builder(
+            passport=passport,
+            transport=RecordingActorTransport(passport),
+            collector=Collector(),
+            agent=MockAgent(),
+        )
+        await actor.arun()
+        await actor.apass(Assignment(id="1", assignation="1", args=args))
+
+        statuses = [status for _, status in actor.transport.changes]
+        for _ in range(100):
+            statuses = [status for _, status in actor.transport.changes]
+            if (
+                AssignationStatus.RETURNED in statuses
+                or AssignationStatus.DONE in statuses
+            ):
+                break
+            await asyncio.sleep(0.1)
+
+        await actor.acancel()
+
+        assert AssignationStatus.CRITICAL not in statuses, function.__name__
+        if function is double_in_process:
+            assert actor.transport.returns == {"1": (8,)}
+        else:
+            assert AssignationStatus.DONE in statuses
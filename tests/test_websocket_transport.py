@@ -0,0 +1,162 @@
+import asyncio
+import json
+import pytest
+from rekuest.agents.transport.protocols.agent_json import (
+    AgentFeatures,
+    AgentMessageTypes,
+    AgentSubMessageTypes,
+    AssignationChangedMessage,
+)
+from rekuest.agents.transport.websocket import WebsocketAgentTransport
+from rekuest.api.schema import AssignationStatus
+from rekuest.codecs import Codec
+
+
+class RecordingClient:
+    def __init__(self) -> None:
+        self.sent = []
+
+    async def send(self, message: str):
+        self.sent.append(json.loads(message))
+
+
+class RejectingCodec(Codec):
+    """Can't encode returns (like a codec that rejects the payload)"""
+
+    def encode(self, message):
+        if getattr(message, "returns", None):
+            raise TypeError("Can't encode returns")
+        return super().encode(message)
+
+
+async def token_loader(force_refresh=False):
+    return "token"
+
+
+async def build_transport(features=None, **kwargs) -> WebsocketAgentTransport:
+    transport = WebsocketAgentTransport(
+        endpoint_url="ws://localhost", token_loader=token_loader, **kwargs
+    )
+    await transport.__aenter__()
+    transport._send_queue = asyncio.Queue()
+    transport._in_queue = asyncio.Queue()
+    transport._connected_future = asyncio.Future()
+    transport._connected = True
+    await transport.receive(
+        json.dumps(
+            {"id": "1", "type": AgentSubMessageTypes.HELLO, "features": features}
+        )
+    )
+    return transport
+
+
+async def send_and_flush(transport: WebsocketAgentTransport, n: int):
+    client = RecordingClient()
+    for i in range(n):
+        await transport.delayaction(
+            AssignationChangedMessage(
+                assignation=str(i), status=AssignationStatus.ASSIGNED
+            )
+        )
+
+    task = asyncio.create_task(transport.sending(client))
+    await asyncio.wait_for(transport._send_queue.join(), timeout=1)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    return client.sent
+
+
+@pytest.mark.asyncio
+async def test_messages_are_batched_if_supported():
+    transport = await build_transport(features=[AgentFeatures.BATCH])
+    sent = await send_and_flush(transport, 5)
+
+    assert len(sent) == 1, "Queued messages should be sent in one frame"
+    assert sent[0]["type"] == AgentMessageTypes.BATCH
+    assert [m["assignation"] for m in sent[0]["messages"]] == list("01234")
+
+
+@pytest.mark.asyncio
+async def test_messages_are_not_batched_without_support():
+    transport = await build_transport()
+    sent = await send_and_flush(transport, 3)
+
+    assert [m["type"] for m in sent] == [AgentMessageTypes.ASSIGN_CHANGED] * 3
+
+
+@pytest.mark.asyncio
+async def test_received_batches_are_unpacked():
+    transport = await build_transport()
+    await transport.receive(
+        json.dumps(
+            {
+                "id": "2",
+                "type": AgentMessageTypes.BATCH,
+                "messages": [
+                    {
+                        "id": "3",
+                        "type": "ASSIGN",
+                        "assignation": "1",
+                        "provision": "1",
+                        "guardian": "1",
+                    },
+                    {
+                        "id": "4",
+                        "type": "UNASSIGN",
+                        "assignation": "1",
+                        "provision": "1",
+                    },
+                ],
+            }
+        )
+    )
+
+    assert transport._in_queue.qsize() == 2
+
+
+@pytest.mark.asyncio
+async def test_assign_args_are_not_validated_or_copied():
+    transport = await build_transport()
+    args = [list(range(1000)), {"a": 1}]
+    await transport.receive_json(
+        {
+            "id": "5",
+            "type": "ASSIGN",
+            "assignation": "1",
+            "provision": "1",
+            "guardian": "1",
+            "args": args,
+        }
+    )
+
+    message = transport._in_queue.get_nowait()
+    assert message.args is args, "Args should be passed on as they were decoded"
+    assert "<2 args>" in repr(message), "Args should not be printed"
+
+
+@pytest.mark.asyncio
+async def test_unencodable_message_only_fails_its_assignation():
+    transport = await build_transport()
+    transport._codec = RejectingCodec()
+    client = RecordingClient()
+
+    await transport.delayaction(
+        AssignationChangedMessage(
+            assignation="1", status=AssignationStatus.RETURNED, returns=[object()]
+        )
+    )
+    await transport.delayaction(
+        AssignationChangedMessage(assignation="2", status=AssignationStatus.DONE)
+    )
+
+    task = asyncio.create_task(transport.sending(client))
+    await asyncio.wait_for(transport._send_queue.join(), timeout=1)
+    assert not task.done(), "The send task should survive the encode error"
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+    assert [(m["assignation"], m["status"]) for m in client.sent] == [
+        ("2", AssignationStatus.DONE),
+        ("1", AssignationStatus.CRITICAL),
+    ]
+    assert transport.metrics()["sent"] == 2